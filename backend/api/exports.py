@@ -0,0 +1,106 @@
+"""
+Фоновое формирование файлов списка покупок.
+
+Файл большого списка покупок формируется в пуле потоков процесса,
+а не в обработчике запроса, поэтому синхронный воркер gunicorn
+освобождается сразу после создания задачи. Задача запускается
+после фиксации транзакции, в которой она создана; готовый файл
+сохраняется в хранилище файлов, а прежние выгрузки пользователя
+удаляются.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from logging import getLogger
+from tempfile import TemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .utils import get_xls_shopping_cart
+from users.models import ShoppingListExport, ShoppingListItem, User
+
+logger = getLogger(__name__)
+
+
+@cache
+def get_export_executor() -> ThreadPoolExecutor:
+    """Возвращает пул потоков для формирования файлов."""
+    return ThreadPoolExecutor(
+        max_workers=settings.SHOPPING_LIST_EXPORT_WORKERS,
+        thread_name_prefix='shopping-list-export',
+    )
+
+
+def start_export(user: User) -> ShoppingListExport:
+    """
+    Возвращает задачу выгрузки текущей версии списка покупок
+    пользователя: готовую или выполняющуюся, если она есть,
+    иначе создает новую и ставит ее в очередь пула.
+    """
+    version: str = ShoppingListItem.objects.filter(user=user).get_version()
+    export: ShoppingListExport | None = (
+        ShoppingListExport.objects
+        .usable()
+        .filter(user=user, version=version)
+        .first()
+    )
+    if export is not None:
+        return export
+    export = ShoppingListExport.objects.create(user=user, version=version)
+    transaction.on_commit(
+        lambda: get_export_executor().submit(run_export, export.pk)
+    )
+    return export
+
+
+def run_export(export_id: int) -> None:
+    """
+    Формирует файл задачи выгрузки. Версия пересчитывается перед
+    чтением списка, так как он мог измениться, пока задача ждала
+    в очереди. Блоки файла записываются во временный файл,
+    из которого сохраняется файл задачи, а не собираются в памяти.
+    """
+    try:
+        if not ShoppingListExport.objects.filter(
+            pk=export_id, status=ShoppingListExport.Status.PENDING
+        ).update(status=ShoppingListExport.Status.RUNNING):
+            return
+        export: ShoppingListExport = ShoppingListExport.objects.get(
+            pk=export_id
+        )
+        items = ShoppingListItem.objects.filter(user_id=export.user_id)
+        export.version = items.get_version()
+        with TemporaryFile() as temp_file:
+            for chunk in get_xls_shopping_cart(
+                items.for_export().iterator()
+            ):
+                temp_file.write(chunk)
+            export.file.save(f'{uuid4().hex}.xls', File(temp_file), False)
+        export.status = ShoppingListExport.Status.DONE
+        export.finished_at = timezone.now()
+        export.save(update_fields=['version', 'file', 'status', 'finished_at'])
+        delete_exports(
+            ShoppingListExport.objects
+            .filter(user_id=export.user_id, finished_at__lt=export.finished_at)
+            .exclude(pk=export.pk)
+        )
+    except Exception:
+        logger.exception('Не удалось сформировать выгрузку %s.', export_id)
+        ShoppingListExport.objects.filter(pk=export_id).update(
+            status=ShoppingListExport.Status.FAILED,
+            finished_at=timezone.now(),
+        )
+    finally:
+        connection.close()
+
+
+def delete_exports(exports: QuerySet) -> None:
+    """Удаляет задачи выгрузки вместе с их файлами."""
+    for export in exports:
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
@@ -1,8 +1,38 @@
+from base64 import b64decode
+from binascii import Error as BinasciiError
+from io import BytesIO
+from os.path import splitext
+from typing import IO, Any
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models.fields.files import FieldFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 
+from .parsers import get_size_limit_message
+from recipes.images import has_actual_variants
 from recipes.models import RecipeIngredient
 
 
+class SavedRelatedListSerializer(serializers.ListSerializer):
+    """
+    Список связанных объектов, который берет объекты из словаря
+    контекста 'saved_related' по имени источника, если они там есть
+    (например, получены при записи рецепта), иначе из экземпляра.
+    """
+
+    def get_attribute(self, instance: Any) -> Any:
+        """Возвращает переданные в контексте или связанные объекты."""
+        saved_related: dict[str, list[Any]] = self.context.get(
+            'saved_related', {}
+        )
+        if self.source in saved_related:
+            return saved_related[self.source]
+        return super().get_attribute(instance)
+
+
 class IngredientRecipeWriteField(serializers.ModelSerializer):
     """Сериализатор для записи данных о ингредиентах рецепта."""
     id = serializers.IntegerField(source='ingredient')
@@ -23,3 +53,86 @@ class IngredientRecipeReadField(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount', 'name', 'measurement_unit',)
+        list_serializer_class = SavedRelatedListSerializer
+
+
+class RecipeImageField(serializers.ImageField):
+    """
+    Поле обложки рецепта для чтения. Возвращает URL уменьшенного
+    варианта, заданного аргументом 'variant' или ключом контекста
+    'image_variant', если вариант сформирован для текущей обложки,
+    иначе URL оригинала.
+    """
+
+    def __init__(self, variant: str | None = None, **kwargs) -> None:
+        self.variant: str | None = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value: FieldFile) -> str | None:
+        """Возвращает абсолютный URL варианта или оригинала обложки."""
+        variant: str | None = self.variant or self.context.get(
+            'image_variant'
+        )
+        if not value or not variant:
+            return super().to_representation(value)
+        variants: dict[str, str] = value.instance.image_variants
+        if not has_actual_variants(value.name, variants) or (
+            variant not in variants
+        ):
+            return super().to_representation(value)
+        url: str = value.storage.url(variants[variant])
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class RecipeImageUploadField(Base64ImageField):
+    """
+    Поле загрузки обложки рецепта: принимает файл из multipart-запроса
+    или строку base64. До полного декодирования изображения размер
+    файла проверяется по размеру загруженного файла или длине строки,
+    а количество пикселей - по заголовку изображения.
+    """
+    header_size = 64 * 1024
+
+    def check_limits(self, size: int, header: IO[bytes]) -> None:
+        """
+        Проверяет размер файла и количество пикселей изображения,
+        читая только заголовок. Файлы, заголовок которых не удалось
+        прочитать, проверяются дальше как обычно.
+        """
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(get_size_limit_message())
+        try:
+            with Image.open(header) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = settings.RECIPE_IMAGE_MAX_PIXELS
+        except (OSError, ValueError):
+            return
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                'Изображение не должно быть больше '
+                f'{settings.RECIPE_IMAGE_MAX_PIXELS // 1_000_000} Мпикс.'
+            )
+
+    def to_internal_value(self, data: Any) -> Any:
+        """Проверяет ограничения и преобразует файл или строку base64."""
+        if isinstance(data, UploadedFile):
+            self.check_limits(data.size, data)
+            data.seek(0)
+            data.name = (
+                self.get_file_name(None) + splitext(data.name)[1].lower()
+            )
+            return serializers.ImageField.to_internal_value(self, data)
+        if isinstance(data, str):
+            encoded: str = data.split(';base64,')[-1]
+            length: int = self.header_size - self.header_size % 4
+            try:
+                header: bytes = b64decode(encoded[:length])
+            except (BinasciiError, ValueError):
+                header = b''
+            self.check_limits(len(encoded) * 3 // 4, BytesIO(header))
+        return super().to_internal_value(data)
@@ -2,7 +2,14 @@ from django.db.models import QuerySet
 from django_filters import rest_framework as filters
 from django_filters.widgets import BooleanWidget
 
-from recipes.models import Recipe, Tag, Ingredient
+from recipes.cache import get_tag_bits
+from recipes.models import Recipe, Ingredient
+from recipes.search import get_search_backend
+
+
+def get_tag_choices() -> list[tuple[str, str]]:
+    """Возвращает варианты фильтра тегов из словаря тегов в памяти."""
+    return [(slug, slug) for slug in get_tag_bits()]
 
 
 class IngredientFilterSet(filters.FilterSet):
@@ -19,15 +26,15 @@ class IngredientFilterSet(filters.FilterSet):
 class RecipeFilterSet(filters.FilterSet):
     """
     Позволяет фильтровать объекты модели Recipe
-    по поля author, tags, is_favorited, is_in_shopping_cart.
+    по поля author, tags, is_favorited, is_in_shopping_cart
+    и искать их по названию и описанию через параметр search.
     """
     author = filters.NumberFilter(
         field_name='author__id',
     )
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
@@ -37,6 +44,9 @@ class RecipeFilterSet(filters.FilterSet):
         method='filter_is_in_shopping_cart',
         widget=BooleanWidget(),
     )
+    search = filters.CharFilter(
+        method='filter_search',
+    )
 
     class Meta:
         model = Recipe
@@ -45,6 +55,25 @@ class RecipeFilterSet(filters.FilterSet):
             'tags',
         ]
 
+    def filter_tags(
+            self, queryset: QuerySet, name: str, value: list[str]
+    ) -> QuerySet[Recipe]:
+        """
+        Фильтрует рецепты, у которых есть хотя бы один из тегов,
+        по маске тегов без соединения с таблицами тегов.
+        """
+        tag_bits: dict[str, int] = get_tag_bits()
+        return queryset.filter_tags([tag_bits[slug] for slug in value])
+
+    def filter_search(
+            self, queryset: QuerySet, name: str, value: str
+    ) -> QuerySet[Recipe]:
+        """
+        Ищет рецепты по названию и описанию через бэкенд поиска
+        и сортирует их по убыванию релевантности.
+        """
+        return get_search_backend().search(queryset, value)
+
     def filter_is_favorited(
             self, queryset: QuerySet, name: str, value: bool
     ) -> QuerySet[Recipe]:
@@ -0,0 +1,262 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import md5
+from json import dumps, loads
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Model, Q, QuerySet
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import View
+
+from .utils import estimate_row_count
+
+
+class CursorLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Пагинация по 'limit'/'offset' с возможностью перейти
+    на постраничный вывод по курсору (keyset) через параметр 'cursor'.
+    Поля курсора — поле даты и первичный ключ — задаются атрибутом
+    представления 'cursor_fields' и сортируются по убыванию; глубина
+    страницы не влияет на стоимость запроса, а общее количество
+    объектов не считается.
+
+    При пагинации по 'limit'/'offset' выбирается на одну строку больше
+    'limit': страница и ссылка на следующую страницу определяются
+    по выбранным строкам, а не по количеству. Количество объектов
+    большой таблицы без фильтров оценивается по статистике
+    планировщика, а количество для отфильтрованного запроса
+    анонимного пользователя кэшируется на короткое время; оба
+    значения используются только для поля ответа 'count'.
+    Поле 'count_exact' сообщает, точное ли количество.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    unordered_cursor_message = (
+        'Курсор нельзя использовать с другой сортировкой, '
+        'например с поиском по релевантности.'
+    )
+
+    def paginate_queryset(
+            self, queryset: QuerySet, request: Request, view: View = None
+    ) -> list[Model] | None:
+        """Выбирает способ пагинации в зависимости от параметров запроса."""
+        self.cursor_fields: tuple[str, ...] | None = getattr(
+            view, 'cursor_fields', None
+        )
+        self.use_cursor: bool = bool(
+            self.cursor_fields
+            and self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return self.paginate_queryset_by_offset(queryset, request)
+        return self.paginate_queryset_by_cursor(queryset, request)
+
+    def paginate_queryset_by_offset(
+            self, queryset: QuerySet, request: Request
+    ) -> list[Model] | None:
+        """
+        Возвращает страницу объектов по 'limit'/'offset'
+        и количество объектов для поля 'count'.
+        """
+        self.request: Request = request
+        self.limit: int | None = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset: int = self.get_offset(request)
+        page: list[Model] = list(
+            queryset[self.offset:self.offset + self.limit + 1]
+        )
+        self.has_next: bool = len(page) > self.limit
+        self.page: list[Model] = page[:self.limit]
+        self.count: int = self.get_count(queryset)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_count(self, queryset: QuerySet) -> int:
+        """
+        Возвращает количество объектов. Если выбрана последняя страница,
+        количество известно по выбранным строкам. Иначе для большой
+        таблицы без фильтров возвращается оценка, для анонимного
+        пользователя - кэшированное значение, для остальных - точное.
+        Оценка и кэшированное значение не бывают меньше
+        количества уже выбранных объектов.
+        """
+        selected: int = self.offset + len(self.page)
+        if not self.has_next and (self.page or not self.offset):
+            self.count_exact: bool = True
+            return selected
+        minimum: int = selected + self.has_next
+        self.count_exact = False
+        if not queryset.query.has_filters():
+            estimate: int | None = estimate_row_count(queryset.model)
+            if (
+                estimate is not None
+                and estimate >= settings.APPROXIMATE_COUNT_THRESHOLD
+            ):
+                return max(estimate, minimum)
+        if self.request.user.is_authenticated:
+            self.count_exact = True
+            return super().get_count(queryset)
+        try:
+            sql: tuple[str, tuple] = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            self.count_exact = True
+            return 0
+        signature: str = md5(repr(sql).encode()).hexdigest()
+        key: str = f'pagination:count:{signature}'
+        count: int | None = cache.get(key)
+        if count is None:
+            count = super().get_count(queryset)
+            cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+            self.count_exact = True
+        return max(count, minimum)
+
+    def paginate_queryset_by_cursor(
+            self, queryset: QuerySet, request: Request
+    ) -> list[Model]:
+        """
+        Возвращает страницу объектов, следующих за позицией курсора
+        (или предшествующих ей для обратного направления). Запрос
+        с другой явной сортировкой, например результаты поиска,
+        упорядоченные по релевантности, отклоняется.
+        """
+        self.request: Request = request
+        ordering: list[str] = [f'-{field}' for field in self.cursor_fields]
+        if queryset.query.order_by and (
+            list(queryset.query.order_by) != ordering
+        ):
+            raise ValidationError(
+                {self.cursor_query_param: [self.unordered_cursor_message]}
+            )
+        self.limit: int = self.get_limit(request)
+        reverse, position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(position, reverse)
+            )
+        if reverse:
+            ordering = list(self.cursor_fields)
+        page: list[Model] = list(
+            queryset.order_by(*ordering)[:self.limit + 1]
+        )
+        has_more: bool = len(page) > self.limit
+        page = page[:self.limit]
+        if reverse:
+            page.reverse()
+        self.has_next: bool = bool(page) and (reverse or has_more)
+        self.has_previous: bool = bool(page) and (
+            has_more if reverse else position is not None
+        )
+        self.page: list[Model] = page
+        return page
+
+    def get_keyset_filter(self, position: list[Any], reverse: bool) -> Q:
+        """
+        Строит условие сравнения кортежа полей курсора с позицией:
+        (a < x) OR (a = x AND b < y) для прямого направления.
+        """
+        lookup: str = 'gt' if reverse else 'lt'
+        condition: Q = Q()
+        equal: dict[str, Any] = {}
+        for field, value in zip(self.cursor_fields, position):
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def encode_cursor(self, obj: Model, reverse: bool) -> str:
+        """Кодирует позицию объекта в строку курсора."""
+        position: list[Any] = []
+        for field in self.cursor_fields:
+            value: Any = getattr(obj, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return urlsafe_b64encode(
+            dumps([reverse, position]).encode()
+        ).decode()
+
+    def decode_cursor(self, request: Request) -> tuple[bool, list | None]:
+        """
+        Декодирует курсор из запроса и приводит позицию к дате
+        и ID: поля курсора — поле даты и первичный ключ.
+        Пустой курсор означает первую страницу.
+        """
+        encoded: str = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            reverse, (date, pk) = loads(urlsafe_b64decode(encoded.encode()))
+            position: list[Any] = [datetime.fromisoformat(date), int(pk)]
+        except (TypeError, ValueError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(reverse, bool):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def get_cursor_link(self, obj: Model, reverse: bool) -> str:
+        """Возвращает ссылку на страницу относительно объекта."""
+        url: str = remove_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(obj, reverse)
+        )
+
+    def get_next_link(self) -> str | None:
+        """Возвращает ссылку на следующую страницу."""
+        if not self.has_next:
+            return None
+        if self.use_cursor:
+            return self.get_cursor_link(self.page[-1], reverse=False)
+        url: str = replace_query_param(
+            self.request.build_absolute_uri(),
+            self.limit_query_param, self.limit
+        )
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_previous_link(self) -> str | None:
+        """Возвращает ссылку на предыдущую страницу."""
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        return self.get_cursor_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data: list[dict[str, Any]]) -> Response:
+        """
+        Возвращает ответ с результатами страницы.
+        При пагинации по курсору поле 'count' не возвращается.
+        """
+        if not self.use_cursor:
+            return Response(
+                OrderedDict(
+                    [
+                        ('count', self.count),
+                        ('count_exact', self.count_exact),
+                        ('next', self.get_next_link()),
+                        ('previous', self.get_previous_link()),
+                        ('results', data),
+                    ]
+                )
+            )
+        return Response(
+            OrderedDict(
+                [
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
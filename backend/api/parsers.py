@@ -0,0 +1,79 @@
+from json import loads
+from typing import Any
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик загрузки, записывающий файлы на диск блоками
+    без накопления в памяти. Запрос, размер которого по заголовку
+    Content-Length больше допустимого, отклоняется до чтения тела;
+    загрузка файла больше RECIPE_IMAGE_MAX_SIZE прерывается
+    на первом блоке, превысившем предел.
+    """
+
+    def handle_raw_input(
+            self, input_data: Any, META: dict[str, Any],
+            content_length: int, boundary: bytes, encoding: str = None
+    ) -> None:
+        """Проверяет размер запроса по заголовку Content-Length."""
+        if content_length > (
+            settings.RECIPE_IMAGE_MAX_SIZE
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        ):
+            raise ValidationError(
+                {'image': [get_size_limit_message()]}
+            )
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        """Записывает блок файла, проверяя его размер."""
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            raise ValidationError(
+                {self.field_name: [get_size_limit_message()]}
+            )
+        return super().receive_data_chunk(raw_data, start)
+
+
+def get_size_limit_message() -> str:
+    """Возвращает сообщение о превышении размера изображения."""
+    return (
+        'Размер изображения не должен превышать '
+        f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ.'
+    )
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """
+    Парсер multipart-запроса на создание и изменение рецепта.
+    Поле 'data' содержит JSON с данными рецепта без обложки,
+    файл 'image' - обложку. Файлы записываются во временные файлы
+    на диске блоками по мере чтения запроса и добавляются к данным
+    рецепта по именам полей.
+    """
+
+    def parse(
+            self, stream: Any, media_type: str = None,
+            parser_context: dict[str, Any] = None
+    ) -> DataAndFiles:
+        """Разбирает запрос и объединяет JSON из 'data' с файлами."""
+        request = parser_context['request']
+        request._request.upload_handlers = [
+            LimitedTemporaryFileUploadHandler(request._request)
+        ]
+        result: DataAndFiles = super().parse(
+            stream, media_type, parser_context
+        )
+        try:
+            data: Any = loads(result.data.get('data') or '{}')
+        except ValueError as error:
+            raise ParseError(f'Поле data должно содержать JSON: {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Поле data должно содержать JSON-объект.')
+        data.update(result.files.dict())
+        return DataAndFiles(data, MultiValueDict())
@@ -1,7 +1,7 @@
-from drf_extra_fields.fields import Base64ImageField
-
 from rest_framework import serializers
 
+from .fields import RecipeImageField
+
 
 class UserRecipeFieldsSet(serializers.Serializer):
     """
@@ -14,8 +14,8 @@ class UserRecipeFieldsSet(serializers.Serializer):
     name = serializers.CharField(
         source='recipe.name', read_only=True
     )
-    image = Base64ImageField(
-        source='recipe.image', read_only=True
+    image = RecipeImageField(
+        variant='thumb', source='recipe.image'
     )
     cooking_time = serializers.IntegerField(
         source='recipe.cooking_time', read_only=True
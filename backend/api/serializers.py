@@ -1,20 +1,32 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from typing import Any
 
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Model
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from .fields import IngredientRecipeWriteField, IngredientRecipeReadField
+from .fields import (
+    IngredientRecipeWriteField, IngredientRecipeReadField,
+    RecipeImageField, RecipeImageUploadField, SavedRelatedListSerializer
+)
 from .serializer_mixins import UserRecipeFieldsSet
 from .validators import (
     tags_unique_validator, ingredients_exist_validator, valide_image_exists,
     ingredients_unique_validator, get_ingredients_or_400, tags_exist_validator,
     recipe_exist_validator, post_request_user_recipe_validator
 )
-from recipes.models import Tag, Ingredient, Recipe, RecipeIngredient
-from users.models import User, FavoriteRecipe, ShoppingCart, Follow
+from recipes.cache import bump_recipes_generation
+from recipes.images import has_actual_variants, schedule_image_variants
+from recipes.models import (
+    Tag, ImageBlob, Ingredient, Recipe, RecipeIngredient
+)
+from recipes.search import get_search_backend
+from users.models import (
+    User, FavoriteRecipe, ShoppingCart, ShoppingListExport,
+    ShoppingListItem, Follow
+)
 
 
 class UserSerializer(DjoserUserSerializer):
@@ -35,6 +47,7 @@ class TagSerializer(serializers.ModelSerializer):
             'id', 'name',
             'color', 'slug',
         )
+        list_serializer_class = SavedRelatedListSerializer
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -47,6 +60,34 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор для модели ShoppingListItem."""
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = (
+            'id', 'name',
+            'measurement_unit', 'amount',
+        )
+
+
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    """Сериализатор для модели ShoppingListExport."""
+    class Meta:
+        model = ShoppingListExport
+        fields = (
+            'id', 'status', 'file',
+            'created_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Recipe (чтение данных)."""
     ingredients = IngredientRecipeReadField(
@@ -54,6 +95,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     tags = TagSerializer(many=True)
     author = UserSerializer(read_only=True)
+    image = RecipeImageField()
     is_favorited = serializers.BooleanField(
         read_only=True, default=False
     )
@@ -72,9 +114,113 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeFastReadSerializer:
+    """
+    Быстрый сериализатор для чтения рецептов по списку ID.
+    Формирует словари напрямую из строк .values() без создания
+    экземпляров моделей и полей DRF; результат совпадает
+    с результатом RecipeReadSerializer без флагов пользователя.
+    """
+    recipe_fields = ('id', 'name', 'image', 'text', 'cooking_time')
+    author_fields = tuple(
+        field for field in UserSerializer.Meta.fields
+        if field != 'is_subscribed'
+    )
+
+    def __init__(self, ids: list[int], context: dict[str, Any]) -> None:
+        self.ids: list[int] = ids
+        self.context: dict[str, Any] = context
+
+    def get_image_url(
+            self, name: str, variants: dict[str, str]
+    ) -> str | None:
+        """
+        Возвращает абсолютный URL обложки или ее варианта
+        из контекста, как RecipeImageField.
+        """
+        if not name:
+            return None
+        variant: str | None = self.context.get('image_variant')
+        if variant and has_actual_variants(name, variants) and (
+            variant in variants
+        ):
+            name = variants[variant]
+        url: str = Recipe._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    @property
+    def data(self) -> list[dict[str, Any]]:
+        """Возвращает представления рецептов в порядке списка ID."""
+        recipes: dict[int, dict[str, Any]] = {
+            row['id']: row
+            for row in Recipe.objects.filter(id__in=self.ids).values(
+                *self.recipe_fields, 'image_variants',
+                *(f'author__{field}' for field in self.author_fields)
+            )
+        }
+        ingredients: defaultdict[int, list[dict[str, Any]]] = (
+            defaultdict(list)
+        )
+        for recipe_id, *values in (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=self.ids)
+            .order_by('id')
+            .values_list(
+                'recipe_id', 'ingredient_id', 'amount',
+                'ingredient__name', 'ingredient__measurement_unit',
+            )
+        ):
+            ingredients[recipe_id].append(
+                dict(zip(('id', 'amount', 'name', 'measurement_unit'), values))
+            )
+        tags: defaultdict[int, list[dict[str, Any]]] = defaultdict(list)
+        for recipe_id, *values in (
+            Recipe.tags.through.objects
+            .filter(recipe_id__in=self.ids)
+            .order_by(*(f'tag__{field}' for field in Tag._meta.ordering))
+            .values_list(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+            )
+        ):
+            tags[recipe_id].append(
+                dict(zip(TagSerializer.Meta.fields, values))
+            )
+        data: list[dict[str, Any]] = []
+        for recipe_id in self.ids:
+            recipe: dict[str, Any] | None = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            data.append(
+                {
+                    'id': recipe['id'],
+                    'name': recipe['name'],
+                    'author': {
+                        **{
+                            field: recipe[f'author__{field}']
+                            for field in self.author_fields
+                        },
+                        'is_subscribed': False,
+                    },
+                    'image': self.get_image_url(
+                        recipe['image'], recipe['image_variants']
+                    ),
+                    'text': recipe['text'],
+                    'cooking_time': recipe['cooking_time'],
+                    'ingredients': ingredients[recipe_id],
+                    'tags': tags[recipe_id],
+                    'is_favorited': False,
+                    'is_in_shopping_cart': False,
+                }
+            )
+        return data
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Recipe."""
-    image = Base64ImageField(
+    image = RecipeImageUploadField(
         validators=[valide_image_exists]
     )
     ingredients = IngredientRecipeWriteField(
@@ -98,94 +244,337 @@ class RecipeSerializer(serializers.ModelSerializer):
         ]
 
     def to_representation(self, instance: Recipe) -> dict[str, Any]:
-        """Готовит данные для отправки в ответе."""
-        if self.context['request'].method in ['POST', 'PATCH']:
-            instance: Recipe = (
-                self.context['view']
-                .get_queryset().get(id=instance.id)
-            )
-        return RecipeReadSerializer(
-            instance=instance, context=self.context
-        ).data
-
+        """
+        Готовит данные для отправки в ответе.
+        После записи ответ формируется из сохраненного экземпляра
+        и ингредиентов и тегов, полученных при проверке и записи
+        и переданных в контексте 'saved_related', без повторной
+        загрузки рецепта. Флаги пользователя нового рецепта ложны;
+        у изменяемого рецепта они загружены представлением вместе
+        с ним и при записи не меняются.
+        """
+        context: dict[str, Any] = self.context
+        if hasattr(self, 'saved_related'):
+            recipe_ingredients, tags = self.saved_related
+            context = {
+                **context,
+                'saved_related': {
+                    'recipeingredient_set': recipe_ingredients,
+                    'tags': tags,
+                },
+            }
+        return RecipeReadSerializer(instance=instance, context=context).data
+
+    @transaction.atomic
     def create(self, validated_data: dict[str, Any]) -> Recipe:
         """
         Создает новый объект 'Recipe'
         на основании валидированных данных.
+        Маска тегов вычисляется по тегам, полученным при проверке,
+        связи с тегами записываются одним запросом.
         """
         ingredients_data: list[OrderedDict[str, int]] = (
             validated_data.pop('ingredients')
         )
         tags_data: list[Tag] = validated_data.pop('tags')
-        all_id: set[int] = set(
-            ingredient_data['ingredient']
-            for ingredient_data in ingredients_data
+        ingredients: dict[int, Ingredient] = get_ingredients_or_400(
+            set(
+                ingredient_data['ingredient']
+                for ingredient_data in ingredients_data
+            )
         )
-        all_ingredients: QuerySet[Ingredient] | serializers.ValidationError = (
-            get_ingredients_or_400(all_id)
+        tags_mask: int = 0
+        for tag in tags_data:
+            tags_mask |= 1 << tag.bit
+        recipe: Recipe = Recipe.objects.create(
+            **validated_data, tags_mask=tags_mask
         )
-        recipe: Recipe = Recipe.objects.create(**validated_data)
         recipe_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=all_ingredients.get(
-                    id=ingredient_data['ingredient']
-                ),
+                ingredient=ingredients[ingredient_data['ingredient']],
                 amount=ingredient_data['amount'],
             )
             for ingredient_data in ingredients_data
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
-        recipe.tags.set(tags_data)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags_data
+        )
+        self.saved_related: tuple[list[RecipeIngredient], list[Tag]] = (
+            recipe_ingredients, sorted(tags_data, key=lambda tag: tag.name)
+        )
         return recipe
 
+    @staticmethod
+    def is_same_file(stored: Any, uploaded: Any) -> bool:
+        """
+        Проверяет, совпадает ли загруженный файл с сохраненным:
+        сначала по размеру, затем по содержимому блоками.
+        """
+        if not stored:
+            return False
+        try:
+            if stored.size != uploaded.size:
+                return False
+            with stored.open('rb') as file:
+                same: bool = all(
+                    stored_chunk == uploaded_chunk
+                    for stored_chunk, uploaded_chunk in zip(
+                        file.chunks(), uploaded.chunks()
+                    )
+                )
+        except OSError:
+            return False
+        uploaded.seek(0)
+        return same
+
+    @transaction.atomic
     def update(
             self, instance: Recipe, validated_data: dict[str, Any]
     ) -> Recipe:
         """
         Обновляет объект 'Recipe'
         на основании валидированных данных.
+        Ингредиенты и теги сравниваются с сохраненными (загруженными
+        представлением заранее): изменяются только строки
+        с другим количеством, добавляются только новые и удаляются
+        только убранные строки. Неизмененный рецепт не записывается.
         """
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = (
-            validated_data.get('cooking_time', instance.cooking_time)
-        )
-        instance.image = validated_data.get('image', instance.image)
+        update_fields: list[str] = [
+            field for field in ('name', 'text', 'cooking_time')
+            if field in validated_data
+            and validated_data[field] != getattr(instance, field)
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        image = validated_data.get('image')
+        if image is not None and not self.is_same_file(instance.image, image):
+            instance.image = image
+            update_fields.append('image')
+        stored: dict[int, RecipeIngredient] = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in instance.recipeingredient_set.all()
+        }
+        stored_tags: set[Tag] = set(instance.tags.all())
+        recipe_ingredients: list[RecipeIngredient] = list(stored.values())
         ingredients_data: list[OrderedDict[str, int]] = (
             validated_data.get('ingredients')
         )
         if ingredients_data:
-            all_id: set[int] = set(
-                ingredient_data['ingredient']
+            old_amounts: dict[int, int] = {
+                ingredient_id: recipe_ingredient.amount
+                for ingredient_id, recipe_ingredient in stored.items()
+            }
+            new_amounts: dict[int, int] = {
+                ingredient_data['ingredient']: ingredient_data['amount']
                 for ingredient_data in ingredients_data
-            )
-            all_ingredients: QuerySet | serializers.ValidationError = (
-                get_ingredients_or_400(all_id)
-            )
-            recipe_ingredients = []
-            for ingredient_data in ingredients_data:
-                recipe_ingredients.append(
+            }
+            added: set[int] = new_amounts.keys() - stored.keys()
+            removed: list[int] = [
+                stored[ingredient_id].pk
+                for ingredient_id in stored.keys() - new_amounts.keys()
+            ]
+            changed: list[RecipeIngredient] = []
+            for ingredient_id, recipe_ingredient in stored.items():
+                amount: int | None = new_amounts.get(ingredient_id)
+                if amount is not None and amount != recipe_ingredient.amount:
+                    recipe_ingredient.amount = amount
+                    changed.append(recipe_ingredient)
+            created: list[RecipeIngredient] = []
+            if added:
+                ingredients: dict[int, Ingredient] = (
+                    get_ingredients_or_400(added)
+                )
+                created = RecipeIngredient.objects.bulk_create(
                     RecipeIngredient(
                         recipe=instance,
-                        ingredient=all_ingredients.get(
-                            id=ingredient_data['ingredient']
-                        ),
-                        amount=ingredient_data['amount'],
+                        ingredient=ingredients[ingredient_id],
+                        amount=new_amounts[ingredient_id],
                     )
+                    for ingredient_id in added
                 )
-            RecipeIngredient.objects.filter(recipe=instance).delete()
-            RecipeIngredient.objects.bulk_create(recipe_ingredients)
+            if changed:
+                RecipeIngredient.objects.bulk_update(changed, ['amount'])
+            if removed:
+                RecipeIngredient.objects.filter(pk__in=removed).delete()
+            if added or changed or removed:
+                ShoppingListItem.objects.change_recipe(
+                    instance.pk, old_amounts, new_amounts
+                )
+                update_fields.append('updated_at')
+            recipe_ingredients = sorted(
+                [
+                    recipe_ingredient
+                    for ingredient_id, recipe_ingredient in stored.items()
+                    if ingredient_id in new_amounts
+                ] + created,
+                key=lambda recipe_ingredient: recipe_ingredient.pk or 0
+            )
         tags_data: list[Tag] = validated_data.get('tags')
         if tags_data:
-            instance.tags.clear()
-            instance.tags.set(tags_data)
-        instance.save()
+            added_tags: set[Tag] = set(tags_data) - stored_tags
+            removed_tags: set[Tag] = stored_tags - set(tags_data)
+            through: type[Model] = Recipe.tags.through
+            if added_tags:
+                through.objects.bulk_create(
+                    through(recipe=instance, tag=tag) for tag in added_tags
+                )
+            if removed_tags:
+                through.objects.filter(
+                    recipe=instance, tag__in=removed_tags
+                ).delete()
+            if added_tags or removed_tags:
+                instance.tags_mask = 0
+                for tag in tags_data:
+                    instance.tags_mask |= 1 << tag.bit
+                update_fields += ['tags_mask', 'updated_at']
+        self.saved_related: tuple[list[RecipeIngredient], list[Tag]] = (
+            recipe_ingredients,
+            sorted(tags_data or stored_tags, key=lambda tag: tag.name)
+        )
+        if update_fields:
+            if 'updated_at' not in update_fields:
+                update_fields.append('updated_at')
+            instance.save(update_fields=set(update_fields))
         return instance
 
 
+class RecipeBulkItemSerializer(RecipeSerializer):
+    """
+    Сериализатор рецепта для пакетного создания.
+    Теги принимаются списком ID без обращения к базе данных:
+    их существование проверяется для всего пакета одним запросом.
+    """
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+
+class RecipeBulkCreateSerializer:
+    """
+    Сериализатор для пакетного создания рецептов.
+    Рецепты проверяются по отдельности, ID тегов и ингредиентов
+    всего пакета проверяются одним запросом для каждой модели;
+    рецепты с ошибками пропускаются, остальные записываются
+    несколькими запросами bulk_create. Так как bulk_create
+    не отправляет сигналы, счетчик рецептов автора, маски тегов,
+    поисковый индекс, варианты обложек и поколение данных о рецептах
+    обновляются здесь.
+    """
+
+    def __init__(self, data: Any, context: dict[str, Any]) -> None:
+        self.initial_data: Any = data
+        self.context: dict[str, Any] = context
+        self.errors: dict[int, dict[str, Any]] = {}
+        self.validated_data: dict[int, dict[str, Any]] = {}
+
+    def is_valid(self) -> bool:
+        """
+        Проверяет рецепты пакета и возвращает True,
+        если хотя бы один рецепт можно создать.
+        """
+        if not isinstance(self.initial_data, list) or not self.initial_data:
+            raise serializers.ValidationError(
+                {'detail': 'Ожидается непустой список рецептов.'}
+            )
+        if len(self.initial_data) > settings.RECIPE_BULK_MAX_SIZE:
+            raise serializers.ValidationError(
+                {
+                    'detail': (
+                        'В пакете не может быть больше '
+                        f'{settings.RECIPE_BULK_MAX_SIZE} рецептов.'
+                    )
+                }
+            )
+        for index, item in enumerate(self.initial_data):
+            serializer = RecipeBulkItemSerializer(
+                data=item, context=self.context
+            )
+            if serializer.is_valid():
+                self.validated_data[index] = serializer.validated_data
+            else:
+                self.errors[index] = serializer.errors
+        ingredient_ids: set[int] = set(
+            Ingredient.objects.filter(
+                id__in={
+                    ingredient_data['ingredient']
+                    for data in self.validated_data.values()
+                    for ingredient_data in data['ingredients']
+                }
+            ).values_list('id', flat=True)
+        )
+        self.tag_bits: dict[int, int] = dict(
+            Tag.objects.filter(
+                id__in={
+                    tag_id
+                    for data in self.validated_data.values()
+                    for tag_id in data['tags']
+                }
+            ).values_list('id', 'bit')
+        )
+        for index, data in list(self.validated_data.items()):
+            errors: dict[str, str] = {}
+            if any(
+                ingredient_data['ingredient'] not in ingredient_ids
+                for ingredient_data in data['ingredients']
+            ):
+                errors['ingredients'] = 'Такого ингредиента не существует.'
+            if any(tag_id not in self.tag_bits for tag_id in data['tags']):
+                errors['tags'] = 'Такого тега не существует.'
+            if errors:
+                self.errors[index] = errors
+                del self.validated_data[index]
+        return bool(self.validated_data)
+
+    @transaction.atomic
+    def save(self, author: User) -> dict[int, Recipe]:
+        """
+        Создает проверенные рецепты пакета, их ингредиенты и связи
+        с тегами и возвращает созданные рецепты по их номерам в пакете.
+        """
+        recipes: dict[int, Recipe] = {}
+        for index, data in self.validated_data.items():
+            tags_mask: int = 0
+            for tag_id in data['tags']:
+                tags_mask |= 1 << self.tag_bits[tag_id]
+            recipes[index] = Recipe(
+                author=author,
+                name=data['name'],
+                text=data['text'],
+                cooking_time=data['cooking_time'],
+                image=data['image'],
+                tags_mask=tags_mask,
+            )
+        Recipe.objects.bulk_create(recipes.values())
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipes[index],
+                ingredient_id=ingredient_data['ingredient'],
+                amount=ingredient_data['amount'],
+            )
+            for index, data in self.validated_data.items()
+            for ingredient_data in data['ingredients']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipes[index], tag_id=tag_id)
+            for index, data in self.validated_data.items()
+            for tag_id in data['tags']
+        )
+        User.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + len(recipes)
+        )
+        ImageBlob.objects.retain(
+            recipe.image.name for recipe in recipes.values()
+        )
+        get_search_backend().update(recipes.values())
+        schedule_image_variants(recipe.pk for recipe in recipes.values())
+        transaction.on_commit(bump_recipes_generation)
+        return recipes
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сокращенный сериализатор для модели Ingredient."""
+    image = RecipeImageField(variant='thumb')
+
     class Meta:
         model = Recipe
         fields = (
@@ -294,7 +683,7 @@ class FollowSerializer(serializers.ModelSerializer):
         many=True, read_only=True
     )
     recipes_count = serializers.IntegerField(
-        read_only=True
+        source='following.recipes_count', read_only=True
     )
     is_subscribed = serializers.BooleanField(
         read_only=True, default=False
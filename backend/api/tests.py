@@ -0,0 +1,298 @@
+import shutil
+import tempfile
+from base64 import b64encode, urlsafe_b64encode
+from io import BytesIO
+from json import dumps
+from typing import Any
+
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .serializers import RecipeFastReadSerializer, RecipeReadSerializer
+from .views import RecipeViewSet
+from recipes.images import generate_image_variants
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import FavoriteRecipe, Follow, ShoppingCart, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Тесты не зависят от бэкенда поиска базы данных.
+SEARCH_BACKEND = 'recipes.search.InMemorySearchBackend'
+
+
+def get_image(color: str) -> SimpleUploadedFile:
+    """Возвращает файл изображения для обложки рецепта."""
+    buffer: BytesIO = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, SEARCH_BACKEND=SEARCH_BACKEND)
+class RecipeFastReadSerializerTest(TestCase):
+    """
+    Проверяет, что RecipeFastReadSerializer формирует тот же JSON,
+    что и RecipeReadSerializer: для рецептов в избранном, корзине
+    и без них, с актуальными, устаревшими и без вариантов обложки.
+    """
+    image_variants = (None, 'card', 'thumb')
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+        cls.stranger = User.objects.create_user(
+            email='stranger@example.com', username='stranger',
+            first_name='Гость', last_name='Рецептов', password='password',
+        )
+        tags: list[Tag] = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Обед', '#49B64E', 'lunch'),
+                ('Завтрак', '#E26C2D', 'breakfast'),
+            )
+        ]
+        ingredients: list[Ingredient] = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар')
+        ]
+        cls.recipes: list[Recipe] = []
+        for number, color in enumerate(('red', 'green', 'blue', 'white')):
+            recipe: Recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=number + 1,
+                image=get_image(color),
+            )
+            recipe.tags.set(tags[:number % 3])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:number]
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[:2]:
+            generate_image_variants(recipe.pk)
+        # Варианты второго рецепта сформированы для прежней обложки.
+        stale: Recipe = Recipe.objects.get(pk=cls.recipes[1].pk)
+        Recipe.objects.filter(pk=stale.pk).update(
+            image_variants={**stale.image_variants, 'source': 'old.png'}
+        )
+        FavoriteRecipe.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        FavoriteRecipe.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[2])
+        Follow.objects.create(user=cls.reader, following=cls.author)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def get_view(
+            self, user: User | None, image_variant: str | None
+    ) -> RecipeViewSet:
+        """Возвращает представление рецептов для запроса пользователя."""
+        request: Request = Request(
+            APIRequestFactory().get('/api/recipes/')
+        )
+        if user is not None:
+            request.user = user
+        view: RecipeViewSet = RecipeViewSet(
+            request=request, format_kwarg=None, kwargs={},
+            action='list' if image_variant else 'retrieve',
+        )
+        view.list_image_variant = image_variant
+        return view
+
+    def render(self, data: Any) -> bytes:
+        """Возвращает JSON, который получит клиент."""
+        return JSONRenderer().render(data)
+
+    def test_image_variants(self) -> None:
+        """Обложка заменяется только актуальным вариантом."""
+        context: dict[str, Any] = self.get_view(
+            None, 'card'
+        ).get_serializer_context()
+        images: list[str] = [
+            recipe['image'] for recipe in RecipeFastReadSerializer(
+                [recipe.pk for recipe in self.recipes], context=context
+            ).data
+        ]
+        self.assertNotIn(self.recipes[0].image.name, images[0])
+        for recipe, image in zip(self.recipes[1:], images[1:]):
+            self.assertTrue(image.endswith(recipe.image.url))
+
+    def test_fragments_identical(self) -> None:
+        """Фрагменты без флагов пользователя совпадают."""
+        ids: list[int] = list(Recipe.objects.values_list('id', flat=True))
+        for image_variant in self.image_variants:
+            with self.subTest(image_variant=image_variant):
+                context: dict[str, Any] = self.get_view(
+                    None, image_variant
+                ).get_serializer_context()
+                self.assertEqual(
+                    self.render(
+                        RecipeFastReadSerializer(ids, context=context).data
+                    ),
+                    self.render(
+                        RecipeReadSerializer(
+                            Recipe.with_related.select_related('author'),
+                            many=True, context=context
+                        ).data
+                    ),
+                )
+
+    def test_user_flags_identical(self) -> None:
+        """
+        Фрагменты с наложенными флагами пользователя совпадают
+        с RecipeReadSerializer по запросу с флагами.
+        """
+        for user in (None, self.reader, self.stranger):
+            for image_variant in self.image_variants:
+                with self.subTest(user=user, image_variant=image_variant):
+                    view: RecipeViewSet = self.get_view(user, image_variant)
+                    with override_settings(FAST_RECIPE_SERIALIZER=True):
+                        fast: list[dict[str, Any]] = (
+                            view.get_representations(
+                                list(view.get_flags_queryset())
+                            )
+                        )
+                    self.assertEqual(
+                        self.render(fast),
+                        self.render(
+                            RecipeReadSerializer(
+                                view.get_queryset(), many=True,
+                                context=view.get_serializer_context()
+                            ).data
+                        ),
+                    )
+
+
+class CursorPaginationTest(TestCase):
+    """Проверяет, что неверный курсор возвращает 404."""
+    url = '/api/recipes/'
+
+    def get(self, cursor: str) -> Response:
+        """Запрашивает страницу рецептов по курсору."""
+        return APIClient().get(self.url, {'cursor': cursor})
+
+    def test_valid_cursor(self) -> None:
+        """Курсор из даты и ID принимается."""
+        cursor: str = urlsafe_b64encode(
+            dumps([False, ['2024-01-01T00:00:00+00:00', 1]]).encode()
+        ).decode()
+        self.assertEqual(self.get(cursor).status_code, 200)
+
+    def test_invalid_cursor(self) -> None:
+        """Курсор с неверной структурой или значениями отклоняется."""
+        for value in (
+            [False, ['notadate', 'x']],
+            [False, ['2024-01-01T00:00:00+00:00', 'x']],
+            [False, [1, 1]],
+            [False, ['2024-01-01T00:00:00+00:00']],
+            [None, ['2024-01-01T00:00:00+00:00', 1]],
+            [False, None],
+            {},
+        ):
+            with self.subTest(value=value):
+                cursor: str = urlsafe_b64encode(
+                    dumps(value).encode()
+                ).decode()
+                self.assertEqual(self.get(cursor).status_code, 404)
+        self.assertEqual(self.get('not-base64!').status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, SEARCH_BACKEND=SEARCH_BACKEND)
+class RecipeWriteResponseTest(TestCase):
+    """
+    Проверяет, что ответ на создание и изменение рецепта совпадает
+    с последующим чтением рецепта, а ингредиенты и теги
+    не загружаются повторно после записи.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.tags: list[Tag] = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Обед', '#49B64E', 'lunch'),
+                ('Завтрак', '#E26C2D', 'breakfast'),
+            )
+        ]
+        cls.ingredients: list[Ingredient] = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар')
+        ]
+        cls.image: str = 'data:image/png;base64,' + b64encode(
+            get_image('red').read()
+        ).decode()
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client: APIClient = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def write(self, method: str, url: str, data: dict[str, Any]) -> Response:
+        """
+        Выполняет запись, проверяет, что после нее ингредиенты
+        и теги не читаются, а ответ совпадает с чтением рецепта.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response: Response = getattr(self.client, method)(
+                url, data, format='json'
+            )
+        self.assertIn(response.status_code, (200, 201), response.data)
+        last_write: int = max(
+            index for index, query in enumerate(context.captured_queries)
+            if not query['sql'].startswith('SELECT')
+        )
+        for query in context.captured_queries[last_write + 1:]:
+            self.assertNotIn('"recipes_tag"', query['sql'])
+            self.assertNotIn('"recipes_recipeingredient"', query['sql'])
+        self.assertEqual(
+            self.client.get(f'/api/recipes/{response.data["id"]}/').data,
+            response.data
+        )
+        return response
+
+    def test_create_and_update(self) -> None:
+        """Ответы на создание и изменение совпадают с чтением."""
+        response: Response = self.write('post', '/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': self.image,
+            'tags': [self.tags[0].pk, self.tags[1].pk],
+            'ingredients': [
+                {'id': self.ingredients[0].pk, 'amount': 1},
+                {'id': self.ingredients[1].pk, 'amount': 2},
+            ],
+        })
+        url: str = f'/api/recipes/{response.data["id"]}/'
+        changed: dict[str, Any] = {
+            'tags': [self.tags[0].pk],
+            'ingredients': [
+                {'id': self.ingredients[1].pk, 'amount': 3},
+                {'id': self.ingredients[2].pk, 'amount': 4},
+            ],
+        }
+        self.write('patch', url, changed)
+        self.write('patch', url, {**changed, 'name': 'Новое название'})
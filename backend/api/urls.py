@@ -35,10 +35,24 @@ urlpatterns = [
     path(
         'recipes/download_shopping_cart/',
         ShoppingCartViewSet.as_view(
-            {'get': 'download_shopping_cart'}
+            {'get': 'download_shopping_cart', 'post': 'start_export'}
         ),
         name='download_shopping_cart'
     ),
+    path(
+        'recipes/download_shopping_cart/<int:pk>/',
+        ShoppingCartViewSet.as_view(
+            {'get': 'export_status'}
+        ),
+        name='shopping_list_export'
+    ),
+    path(
+        'recipes/shopping_list/',
+        ShoppingCartViewSet.as_view(
+            {'get': 'shopping_list'}
+        ),
+        name='shopping_list'
+    ),
     path(
         'recipes/<int:id>/shopping_cart/',
         ShoppingCartViewSet.as_view(
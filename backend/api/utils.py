@@ -1,10 +1,16 @@
-from io import BytesIO
+from collections import OrderedDict
 from http import HTTPStatus
-from typing import Any
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from typing import Any, Iterable, Iterator
 
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db import connection
+from django.db.models import Model
 from django.http.response import HttpResponse
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import Cell
 from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
@@ -25,35 +31,207 @@ def custom_exception_handler(
     return response
 
 
-def get_xls_shopping_cart(ingredients: QuerySet) -> BytesIO:
+def estimate_row_count(model: type[Model]) -> int | None:
+    """
+    Возвращает оценку количества строк таблицы модели
+    по статистике планировщика PostgreSQL.
+    Для других СУБД и таблиц без статистики возвращает None.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = to_regclass(%s)',
+            [model._meta.db_table]
+        )
+        row: tuple[int] | None = cursor.fetchone()
+    if not row or row[0] < 0:
+        return None
+    return row[0]
+
+
+class LRUBytesCache:
+    """
+    Кэш байтовых значений в памяти процесса, ограниченный суммарным
+    размером: при переполнении вытесняются давно не использованные
+    значения. Значения больше 'max_item_size' не сохраняются.
+    """
+
+    def __init__(self, max_size: int, max_item_size: int) -> None:
+        self.max_size: int = max_size
+        self.max_item_size: int = max_item_size
+        self.size: int = 0
+        self.items: OrderedDict[str, bytes] = OrderedDict()
+        self.lock: Lock = Lock()
+
+    def get(self, key: str) -> bytes | None:
+        """Возвращает значение и отмечает его как недавно использованное."""
+        with self.lock:
+            value: bytes | None = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Сохраняет значение, вытесняя давно не использованные."""
+        if len(value) > self.max_item_size:
+            return
+        with self.lock:
+            previous: bytes | None = self.items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.items[key] = value
+            self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def store_chunks(
+            self, key: str, chunks: Iterable[bytes]
+    ) -> Iterator[bytes]:
+        """
+        Передает блоки дальше и сохраняет собранное значение,
+        если все блоки были получены и размер не превышен.
+        """
+        collected: list[bytes] = []
+        size: int = 0
+        for chunk in chunks:
+            yield chunk
+            size += len(chunk)
+            if size <= self.max_item_size:
+                collected.append(chunk)
+        if size <= self.max_item_size:
+            self.set(key, b''.join(collected))
+
+
+shopping_list_files: LRUBytesCache = LRUBytesCache(
+    settings.SHOPPING_LIST_CACHE_MAX_SIZE,
+    settings.SHOPPING_LIST_CACHE_MAX_ITEM_SIZE,
+)
+
+
+class QueueWriter:
+    """
+    Файлоподобный объект, передающий записанные байты в ограниченную
+    очередь блоками не меньше 'chunk_size'. Запись блокируется,
+    пока потребитель не заберет предыдущие блоки, и прерывается
+    исключением после отмены потребителем.
+    """
+
+    def __init__(self, queue: Queue, cancelled: Event, chunk_size: int):
+        self.queue: Queue = queue
+        self.cancelled: Event = cancelled
+        self.chunk_size: int = chunk_size
+        self.buffer: bytearray = bytearray()
+
+    def put(self, item: Any) -> None:
+        """Помещает элемент в очередь, ожидая свободного места."""
+        while True:
+            if self.cancelled.is_set():
+                raise OSError('Передача файла прервана.')
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except Full:
+                continue
+
+    def write(self, data: bytes) -> int:
+        """Добавляет байты в буфер и отправляет заполненный блок."""
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        """Отправляет накопленные байты в очередь."""
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+
+def stream_workbook(workbook: Workbook) -> Iterator[bytes]:
+    """
+    Возвращает итератор по блокам файла книги Excel.
+    Книга сохраняется в отдельном потоке в ограниченную очередь,
+    поэтому блоки отдаются клиенту по мере формирования архива,
+    а в памяти хранится не больше XLSX_STREAM_QUEUE_SIZE блоков.
+    """
+    queue: Queue = Queue(maxsize=settings.XLSX_STREAM_QUEUE_SIZE)
+    cancelled: Event = Event()
+    writer: QueueWriter = QueueWriter(
+        queue, cancelled, settings.XLSX_STREAM_CHUNK_SIZE
+    )
+    errors: list[BaseException] = []
+
+    def save() -> None:
+        try:
+            workbook.save(writer)
+            writer.flush()
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            try:
+                writer.put(None)
+            except OSError:
+                pass
+
+    thread: Thread = Thread(target=save, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk: bytes | None = queue.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        cancelled.set()
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def get_xls_shopping_cart(
+        ingredients: Iterable[dict[str, Any]]
+) -> Iterator[bytes]:
     """
     Функция для создания файла Excel (XLS)
     со списком покупок на основе переданных ингредиентов.
+    Возвращает генератор блоков файла для потоковой передачи:
+    ингредиенты читаются, а строки записываются только при запросе
+    первого блока, поэтому ответ начинается до формирования книги.
+    Книга создается в режиме только для записи: строки сразу
+    сериализуются во временный файл и не хранятся в памяти.
     """
-    wb: Workbook = Workbook()
+    wb: Workbook = Workbook(write_only=True)
     wb.add_named_style(header_style)
     wb.add_named_style(body_style)
-    ws = wb.active
+    ws = wb.create_sheet()
     ws.column_dimensions['A'].width = 4
     ws.column_dimensions['B'].width = 65
     ws.column_dimensions['C'].width = 20
+
+    def styled_row(values: list[Any], style: str) -> list[Cell]:
+        cells: list[Cell] = []
+        for value in values:
+            cell: Cell = WriteOnlyCell(ws, value)
+            cell.style = style
+            cells.append(cell)
+        return cells
+
     ws.append(
-        ['№', 'Ингредиент', 'Количество']
+        styled_row(['№', 'Ингредиент', 'Количество'], 'header_style')
     )
-    for cell in ws[1]:
-        cell.style = 'header_style'
-    number: int = 1
-    for ingredient in ingredients:
-        name: str = ingredient['recipe__recipeingredient__ingredient__name']
-        total_amount: str = ingredient['total_amount']
-        unit: str = ingredient[
-            "recipe__recipeingredient__ingredient__measurement_unit"
-        ]
-        ws.append([number, name, f'{total_amount} {unit}'])
-        for cell in ws[1 + number]:
-            cell.style = 'body_style'
-        number += 1
-    buffer: BytesIO = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    return buffer
+    for number, ingredient in enumerate(ingredients, 1):
+        name: str = ingredient['name']
+        total_amount: int = ingredient['total_amount']
+        unit: str = ingredient['measurement_unit']
+        ws.append(
+            styled_row([number, name, f'{total_amount} {unit}'], 'body_style')
+        )
+    yield from stream_workbook(wb)
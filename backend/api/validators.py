@@ -1,7 +1,7 @@
 from collections import OrderedDict
 from typing import Any
 
-from django.db.models import Model, QuerySet
+from django.db.models import Model
 from rest_framework.serializers import ValidationError
 from rest_framework.request import Request
 
@@ -70,13 +70,15 @@ def ingredients_unique_validator(
         seen_ingredients.add(ingredient_id)
 
 
-def get_ingredients_or_400(all_id: set[int]) -> QuerySet | ValidationError:
+def get_ingredients_or_400(
+        all_id: set[int]
+) -> dict[int, Ingredient] | ValidationError:
     """
-    Получает ингредиенты по их ID или вызывает 'ValidationError',
-    если какого-нибудь из объектов не существует.
+    Получает ингредиенты по их ID одним запросом или вызывает
+    'ValidationError', если какого-нибудь из объектов не существует.
     """
-    existing_ingredients: QuerySet = Ingredient.objects.filter(
-        id__in=all_id
+    existing_ingredients: dict[int, Ingredient] = (
+        Ingredient.objects.in_bulk(all_id)
     )
     if len(all_id) != len(existing_ingredients):
         raise ValidationError(
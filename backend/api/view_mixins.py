@@ -1,10 +1,35 @@
-from django.db.models import Model
-from django.http import Http404
-from django.shortcuts import get_object_or_404
+from datetime import datetime
+from gzip import compress as gzip_compress
+from hashlib import md5
+from typing import Any, Callable
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model, QuerySet
+from django.http import Http404, HttpResponse, HttpResponseBase
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
+from .serializers import RecipeFastReadSerializer, RecipeReadSerializer
+from recipes.cache import get_catalog_generation, get_recipes_generation
+from recipes.ingredient_index import get_ingredient_index
 from recipes.models import Recipe
 
+try:
+    from brotli import compress as brotli_compress
+except ImportError:
+    brotli_compress = None
+
+_catalog_payloads: dict[str, tuple[int, dict[str, Any]]] = {}
+
 
 class GetNonePaginatorAllowAny:
     """
@@ -16,6 +41,242 @@ class GetNonePaginatorAllowAny:
     permission_classes = [AllowAny]
 
 
+class ConditionalGetMixin:
+    """
+    Миксин для ответа на условные GET-запросы (If-None-Match,
+    If-Modified-Since) статусом 304 без формирования тела ответа.
+    Валидаторы вычисляются методом 'get_validators' до сериализации
+    и добавляются в заголовки ответа вместе с 'Cache-Control' и 'Vary'.
+    """
+    conditional_actions = ('list', 'retrieve')
+    vary_headers = ('Authorization',)
+
+    def get_validators(
+            self, request: Request
+    ) -> tuple[str | None, datetime | None]:
+        """Возвращает ETag и дату изменения ресурса."""
+        raise NotImplementedError
+
+    def get_cache_control(self, request: Request) -> dict[str, Any]:
+        """Возвращает директивы заголовка 'Cache-Control'."""
+        return {'no_cache': True}
+
+    def get_conditional_response(
+            self, view: Callable[..., Response], request: Request,
+            *args: Any, **kwargs: Any
+    ) -> HttpResponseBase:
+        """
+        Возвращает ответ 304, если ресурс не изменился,
+        иначе формирует ответ и добавляет к нему валидаторы.
+        """
+        if self.action not in self.conditional_actions:
+            return view(request, *args, **kwargs)
+        etag, last_modified = self.get_validators(request)
+        if etag is not None:
+            etag = quote_etag(etag)
+        timestamp: int | None = (
+            int(last_modified.timestamp()) if last_modified else None
+        )
+        response: HttpResponseBase | None = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+        if etag is not None:
+            response.headers.setdefault('ETag', etag)
+        if timestamp is not None:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+        patch_cache_control(response, **self.get_cache_control(request))
+        patch_vary_headers(response, self.vary_headers)
+        return response
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Возвращает список объектов с учетом условных заголовков."""
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(
+            self, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        """Возвращает объект с учетом условных заголовков."""
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class CatalogConditionalGetMixin(ConditionalGetMixin):
+    """
+    Миксин условных GET-запросов для справочников тегов и ингредиентов.
+    ETag строится из поколения справочников и адреса запроса.
+    """
+    vary_headers = ()
+
+    def get_validators(
+            self, request: Request
+    ) -> tuple[str | None, datetime | None]:
+        """Возвращает ETag справочника для запроса."""
+        return md5(
+            f'{get_catalog_generation()}:{request.get_full_path()}'.encode()
+        ).hexdigest(), None
+
+    def get_cache_control(self, request: Request) -> dict[str, Any]:
+        """Разрешает хранить справочник в общих кэшах с ревалидацией."""
+        return {'no_cache': True, 'public': True}
+
+
+class IngredientIndexMixin:
+    """
+    Миксин для ответа на запросы автодополнения ингредиентов
+    по префиксу названия из индекса в памяти процесса
+    без обращения к базе данных. С параметром 'fuzzy' выполняется
+    поиск с учетом опечаток с ограничением количества результатов.
+    """
+    prefix_query_param = 'name'
+    fuzzy_query_param = 'fuzzy'
+    limit_query_param = 'limit'
+
+    def get_search_limit(self, request: Request) -> int:
+        """Возвращает количество результатов поиска с учетом опечаток."""
+        try:
+            limit: int = min(
+                int(
+                    request.query_params.get(
+                        self.limit_query_param,
+                        settings.INGREDIENT_SEARCH_DEFAULT_LIMIT
+                    )
+                ),
+                settings.INGREDIENT_SEARCH_MAX_LIMIT
+            )
+        except ValueError:
+            limit = settings.INGREDIENT_SEARCH_DEFAULT_LIMIT
+        return max(limit, 0)
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Возвращает ингредиенты, название которых начинается с 'name',
+        или ранжированные результаты поиска с учетом опечаток.
+        """
+        prefix: str | None = request.query_params.get(
+            self.prefix_query_param
+        )
+        if not prefix:
+            return super().list(request, *args, **kwargs)
+        if request.query_params.get(self.fuzzy_query_param) in (
+            '1', 'true', 'True'
+        ):
+            return Response(
+                get_ingredient_index().search(
+                    prefix,
+                    self.get_search_limit(request),
+                    settings.INGREDIENT_SIMILARITY_THRESHOLD
+                )
+            )
+        return Response(get_ingredient_index().startswith(prefix))
+
+
+class PrecompressedCatalogMixin(CatalogConditionalGetMixin):
+    """
+    Миксин для отдачи полного справочника без фильтров из тела ответа,
+    заранее отрендеренного в JSON и сжатого gzip и, если установлен
+    пакет brotli, brotli. Тела и их ETag хранятся в памяти процесса
+    и формируются заново после изменения поколения справочников.
+    """
+    vary_headers = ('Accept-Encoding',)
+
+    def is_full_catalog_request(self, request: Request) -> bool:
+        """Проверяет, запрошен ли полный справочник в формате JSON."""
+        return (
+            self.action == 'list'
+            and not request.query_params
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def build_catalog_payload(self) -> dict[str, Any]:
+        """Рендерит полный справочник в JSON и сжимает его."""
+        body: bytes = JSONRenderer().render(
+            self.get_serializer(self.get_queryset(), many=True).data
+        )
+        payload: dict[str, Any] = {
+            'etag': f'W/"{md5(body).hexdigest()}"',
+            'identity': body,
+            'gzip': gzip_compress(body, compresslevel=9, mtime=0),
+        }
+        if brotli_compress is not None:
+            payload['br'] = brotli_compress(body)
+        return payload
+
+    def get_catalog_payload(self) -> dict[str, Any]:
+        """
+        Возвращает сжатые тела полного справочника,
+        формируя их заново после изменения поколения справочников.
+        """
+        generation: int = get_catalog_generation()
+        key: str = self.__class__.__name__
+        cached: tuple[int, dict[str, Any]] | None = (
+            _catalog_payloads.get(key)
+        )
+        if cached is None or cached[0] != generation:
+            cached = (generation, self.build_catalog_payload())
+            _catalog_payloads[key] = cached
+        return cached[1]
+
+    def get_validators(
+            self, request: Request
+    ) -> tuple[str | None, datetime | None]:
+        """
+        Возвращает слабый ETag по содержимому полного справочника
+        или ETag справочника для запроса с фильтрами.
+        """
+        if self.is_full_catalog_request(request):
+            return self.get_catalog_payload()['etag'], None
+        return super().get_validators(request)
+
+    def get_accepted_encoding(
+            self, request: Request, payload: dict[str, Any]
+    ) -> str:
+        """
+        Выбирает сжатие тела по заголовку 'Accept-Encoding':
+        brotli, затем gzip, иначе без сжатия.
+        """
+        accepted: set[str] = set()
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            coding, _, params = item.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+                continue
+            accepted.add(coding.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in payload and encoding in accepted:
+                return encoding
+        return 'identity'
+
+    def get_catalog_response(
+            self, request: Request, *args: Any, **kwargs: Any
+    ) -> HttpResponse:
+        """Возвращает ответ с готовым телом полного справочника."""
+        payload: dict[str, Any] = self.get_catalog_payload()
+        encoding: str = self.get_accepted_encoding(request, payload)
+        response: HttpResponse = HttpResponse(
+            payload[encoding], content_type='application/json'
+        )
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Возвращает полный справочник из готового тела
+        или список с фильтрами обычным способом.
+        """
+        if self.is_full_catalog_request(request):
+            return self.get_conditional_response(
+                self.get_catalog_response, request, *args, **kwargs
+            )
+        return super().list(request, *args, **kwargs)
+
+
 class UserRecipeViewSet:
     """
     Миксин для представлений, связанных с рецептами пользователя.
@@ -38,3 +299,225 @@ class UserRecipeViewSet:
             user=self.request.user,
             recipe=self.get_recipe()
         )
+
+
+class AnonymousRecipeCacheMixin:
+    """
+    Миксин для кэширования ответов на GET-запросы анонимных пользователей
+    к списку и странице рецепта. Ключ кэша содержит текущее поколение
+    данных о рецептах, поэтому после любого изменения рецептов
+    закэшированные ответы перестают использоваться без их удаления.
+    """
+    cache_query_params = (
+        'tags', 'author', 'search', 'limit', 'offset', 'cursor'
+    )
+
+    def get_cache_key(self, request: Request) -> str:
+        """
+        Возвращает ключ кэша для запроса
+        из нормализованных параметров запроса.
+        """
+        params: list[tuple[str, str]] = sorted(
+            (param, value)
+            for param in self.cache_query_params
+            for value in request.query_params.getlist(param)
+        )
+        return (
+            f'recipes:response:{get_recipes_generation()}:'
+            f'{request.scheme}://{request.get_host()}:'
+            f'{self.action}:{self.kwargs.get(self.lookup_field, "")}:'
+            f'{urlencode(params)}'
+        )
+
+    def get_cached_response(
+            self, view: Callable[..., Response], request: Request,
+            *args: Any, **kwargs: Any
+    ) -> Response:
+        """
+        Возвращает закэшированный ответ для анонимного пользователя
+        или формирует его и сохраняет в кэш.
+        """
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key: str = self.get_cache_key(request)
+        data: Any = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response: Response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPES_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Возвращает список рецептов с учетом кэша."""
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(
+            self, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        """Возвращает рецепт с учетом кэша."""
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class RecipeFragmentCacheMixin:
+    """
+    Миксин для формирования списка и страницы рецепта
+    из закэшированных фрагментов. Фрагмент содержит не зависящую
+    от пользователя часть представления рецепта и хранится по ключу
+    из ID и даты изменения рецепта, которая выбирается в запросе
+    страницы вместе с флагами пользователя; флаги накладываются
+    поверх фрагментов. Изменение одного рецепта не вытесняет
+    фрагменты остальных.
+    Недостающие фрагменты формируются RecipeFastReadSerializer,
+    если включена настройка FAST_RECIPE_SERIALIZER,
+    иначе RecipeReadSerializer. В списках рецептов обложка
+    заменяется уменьшенным вариантом 'card', поэтому фрагменты
+    для списков и страницы рецепта хранятся отдельно.
+    """
+    list_image_variant = 'card'
+    list_actions = ('list', 'trending')
+
+    def get_image_variant(self) -> str | None:
+        """Возвращает вариант обложки для действия представления."""
+        if self.action in self.list_actions:
+            return self.list_image_variant
+        return None
+
+    def get_serializer_context(self) -> dict[str, Any]:
+        """Добавляет в контекст вариант обложки для действия."""
+        context: dict[str, Any] = super().get_serializer_context()
+        context['image_variant'] = self.get_image_variant()
+        return context
+
+    def get_fragment_key(self, recipe: Recipe) -> str:
+        """Возвращает ключ кэша фрагмента рецепта."""
+        return (
+            f'recipes:fragment:{self.get_image_variant()}:'
+            f'{self.request.scheme}://{self.request.get_host()}:'
+            f'{recipe.id}:{recipe.updated_at.timestamp()}'
+        )
+
+    def build_fragments(self, ids: list[int]) -> list[dict[str, Any]]:
+        """Формирует фрагменты рецептов по списку ID."""
+        if settings.FAST_RECIPE_SERIALIZER:
+            return RecipeFastReadSerializer(
+                ids, context=self.get_serializer_context()
+            ).data
+        return RecipeReadSerializer(
+            Recipe.with_related.select_related('author').filter(id__in=ids),
+            many=True, context=self.get_serializer_context()
+        ).data
+
+    def get_fragments(
+            self, recipes: list[Recipe]
+    ) -> dict[int, dict[str, Any]]:
+        """
+        Получает фрагменты рецептов одним запросом к кэшу,
+        формируя и сохраняя в кэш недостающие.
+        """
+        keys: dict[int, str] = {
+            recipe.id: self.get_fragment_key(recipe) for recipe in recipes
+        }
+        cached: dict[str, dict[str, Any]] = cache.get_many(keys.values())
+        fragments: dict[int, dict[str, Any]] = {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items() if key in cached
+        }
+        missing: list[int] = [
+            recipe_id for recipe_id in keys if recipe_id not in fragments
+        ]
+        if missing:
+            built: dict[int, dict[str, Any]] = {
+                fragment['id']: fragment
+                for fragment in self.build_fragments(missing)
+            }
+            cache.set_many(
+                {keys[recipe_id]: data for recipe_id, data in built.items()},
+                settings.RECIPES_CACHE_TIMEOUT
+            )
+            fragments.update(built)
+        return fragments
+
+    def get_flags_queryset(self) -> QuerySet[Recipe]:
+        """
+        Возвращает запрос рецептов без связанных объектов
+        с датой изменения и флагами текущего пользователя.
+        """
+        queryset: QuerySet[Recipe] = Recipe.objects.only(
+            'id', 'pub_date', 'updated_at'
+        )
+        if self.request.user.is_authenticated:
+            return queryset.annotate_user_flags(self.request.user)
+        return queryset
+
+    def get_flags_object(self) -> Recipe:
+        """
+        Получает рецепт из запроса с флагами пользователя так же,
+        как get_object: с фильтрацией, поиском по lookup_url_kwarg
+        и проверкой прав на объект.
+        """
+        queryset: QuerySet[Recipe] = self.filter_queryset(
+            self.get_flags_queryset()
+        )
+        lookup_url_kwarg: str = self.lookup_url_kwarg or self.lookup_field
+        recipe: Recipe = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, recipe)
+        return recipe
+
+    def get_representations(
+            self, recipes: list[Recipe]
+    ) -> list[dict[str, Any]]:
+        """Накладывает флаги пользователя на фрагменты рецептов."""
+        fragments: dict[int, dict[str, Any]] = self.get_fragments(recipes)
+        data: list[dict[str, Any]] = []
+        for recipe in recipes:
+            fragment: dict[str, Any] = fragments[recipe.id]
+            data.append(
+                {
+                    **fragment,
+                    'author': {
+                        **fragment['author'],
+                        'is_subscribed': getattr(
+                            recipe, 'author_is_subscribed', False
+                        ),
+                    },
+                    'is_favorited': getattr(recipe, 'is_favorited', False),
+                    'is_in_shopping_cart': getattr(
+                        recipe, 'is_in_shopping_cart', False
+                    ),
+                }
+            )
+        return data
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        Возвращает список рецептов, собранный из фрагментов
+        с наложенными флагами текущего пользователя.
+        """
+        queryset: QuerySet[Recipe] = self.filter_queryset(
+            self.get_flags_queryset()
+        )
+        page: list[Recipe] | None = self.paginate_queryset(queryset)
+        data: list[dict[str, Any]] = self.get_representations(
+            list(queryset) if page is None else page
+        )
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve(
+            self, request: Request, *args: Any, **kwargs: Any
+    ) -> Response:
+        """
+        Возвращает рецепт, собранный из фрагмента
+        с наложенными флагами текущего пользователя.
+        """
+        return Response(
+            self.get_representations([self.get_flags_object()])[0]
+        )
@@ -1,30 +1,49 @@
-from io import BytesIO
+from datetime import datetime
+from hashlib import md5
+from typing import Any, Iterator
 
-from django.db.models import QuerySet, Exists, OuterRef, Count
-from django.http import FileResponse, Http404
+from django.conf import settings
+from django.db.models import QuerySet, Exists, OuterRef
+from django.http import (
+    Http404, HttpResponse, HttpResponseBase, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
+from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import (
     IsAuthenticated, IsAuthenticatedOrReadOnly
 )
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.viewsets import ModelViewSet
 
 from .filters import RecipeFilterSet, IngredientFilterSet
+from .parsers import RecipeMultiPartParser
 from .permissions import IsAuthor
 from .serializers import (
     UserSerializer, TagSerializer,
-    IngredientSerializer, RecipeSerializer,
+    IngredientSerializer, RecipeBulkCreateSerializer, RecipeSerializer,
     ShoppingCartSerializer, FavoriteRecipeSerializer,
-    FollowSerializer
+    FollowSerializer, ShoppingListExportSerializer,
+    ShoppingListItemSerializer
+)
+from .view_mixins import (
+    AnonymousRecipeCacheMixin, ConditionalGetMixin,
+    GetNonePaginatorAllowAny, IngredientIndexMixin,
+    PrecompressedCatalogMixin, RecipeFragmentCacheMixin, UserRecipeViewSet
 )
-from .view_mixins import GetNonePaginatorAllowAny, UserRecipeViewSet
-from .utils import get_xls_shopping_cart
+from .exports import start_export
+from .utils import get_xls_shopping_cart, shopping_list_files
 from recipes.models import Tag, Ingredient, Recipe
-from users.models import User, ShoppingCart, FavoriteRecipe, Follow
+from users.models import (
+    User, ShoppingCart, ShoppingListExport, ShoppingListItem,
+    FavoriteRecipe, Follow
+)
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -52,13 +71,15 @@ class UserViewSet(DjoserUserViewSet):
         return Response(serializer.data)
 
 
-class TagViewSet(GetNonePaginatorAllowAny, ModelViewSet):
+class TagViewSet(PrecompressedCatalogMixin, GetNonePaginatorAllowAny,
+                 ModelViewSet):
     """Представление, отвечающее за работу с тегами."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(GetNonePaginatorAllowAny, ModelViewSet):
+class IngredientViewSet(PrecompressedCatalogMixin, IngredientIndexMixin,
+                        GetNonePaginatorAllowAny, ModelViewSet):
     """Представление, отвечающее за работу с ингредиентами."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -67,7 +88,8 @@ class IngredientViewSet(GetNonePaginatorAllowAny, ModelViewSet):
     search_fields = ('name',)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousRecipeCacheMixin,
+                    RecipeFragmentCacheMixin, ModelViewSet):
     """Представление, отвечающее за работу с рецептами."""
     serializer_class = RecipeSerializer
     permission_classes = [
@@ -75,6 +97,9 @@ class RecipeViewSet(ModelViewSet):
         IsAuthor
     ]
     filterset_class = RecipeFilterSet
+    parser_classes = [JSONParser, RecipeMultiPartParser]
+    cursor_fields = ('pub_date', 'id')
+    conditional_actions = ('retrieve',)
     http_method_names = [
         'get', 'post',
         'patch', 'delete'
@@ -92,29 +117,240 @@ class RecipeViewSet(ModelViewSet):
             .annotate_user_flags(user=self.request.user)
         )
 
+    def get_validators(
+            self, request: Request
+    ) -> tuple[str | None, datetime | None]:
+        """
+        Вычисляет ETag и дату изменения рецепта одним запросом
+        без загрузки связанных объектов. Для авторизованного пользователя
+        ETag учитывает его флаги, а дата изменения не возвращается,
+        так как флаги могут измениться без изменения рецепта.
+        """
+        pk: str = str(self.kwargs.get(self.lookup_field))
+        if not pk.isdigit():
+            return None, None
+        queryset: QuerySet = Recipe.objects.filter(pk=pk)
+        fields: list[str] = ['updated_at']
+        if request.user.is_authenticated:
+            queryset = queryset.annotate_user_flags(request.user)
+            fields += [
+                'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed'
+            ]
+        row: tuple[Any, ...] | None = queryset.values_list(*fields).first()
+        if row is None:
+            return None, None
+        etag: str = md5(f'{pk}:{row}'.encode()).hexdigest()
+        if request.user.is_authenticated:
+            return etag, None
+        return etag, row[0]
+
+    def get_cache_control(self, request: Request) -> dict[str, Any]:
+        """
+        Требует ревалидации рецепта при каждом запросе;
+        ответы авторизованным пользователям хранятся только в их кэше.
+        """
+        if request.user.is_authenticated:
+            return {'no_cache': True, 'private': True}
+        return {'no_cache': True, 'public': True}
+
+    @action(
+        detail=False,
+        methods=['get'],
+    )
+    def trending(self, request: Request) -> Response:
+        """
+        Возвращает самые популярные рецепты по оценке
+        с затуханием по времени добавления в избранное и корзину.
+        """
+        try:
+            limit: int = min(
+                int(
+                    request.query_params.get(
+                        'limit', settings.TRENDING_DEFAULT_LIMIT
+                    )
+                ),
+                settings.TRENDING_MAX_LIMIT
+            )
+        except ValueError:
+            limit = settings.TRENDING_DEFAULT_LIMIT
+        recipes: list[Recipe] = list(
+            self.filter_queryset(self.get_flags_queryset())
+            .trending()[:max(limit, 0)]
+        )
+        return Response(self.get_representations(recipes))
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk(self, request: Request) -> Response:
+        """
+        Создает рецепты из списка в теле запроса. Рецепты с ошибками
+        не создаются и не мешают созданию остальных; в ответе для
+        каждого рецепта по его номерам в списке возвращается ID
+        созданного рецепта или ошибки.
+        """
+        serializer: RecipeBulkCreateSerializer = RecipeBulkCreateSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        recipes: dict[int, Recipe] = {}
+        if serializer.is_valid():
+            recipes = serializer.save(author=request.user)
+        results: list[dict[str, Any]] = [
+            {'index': index, 'id': recipes[index].pk}
+            if index in recipes
+            else {'index': index, 'errors': serializer.errors[index]}
+            for index in range(len(request.data))
+        ]
+        if not recipes:
+            response_status: int = status.HTTP_400_BAD_REQUEST
+        elif serializer.errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(results, status=response_status)
+
     def perform_create(self, serializer: RecipeSerializer) -> None:
         """Создаем рецепт и присваем текущего пользователя."""
         serializer.save(author=self.request.user)
 
 
-class ShoppingCartViewSet(UserRecipeViewSet, ModelViewSet):
+class ShoppingCartViewSet(ConditionalGetMixin, UserRecipeViewSet,
+                          ModelViewSet):
     """Представление, отвечающее за работу с корзиной покупок."""
     queryset = ShoppingCart.objects.select_related('user', 'recipe')
     serializer_class = ShoppingCartSerializer
     http_method_names = ['get', 'post', 'delete']
+    conditional_actions = ('download_shopping_cart',)
+
+    def get_validators(
+            self, request: Request
+    ) -> tuple[str | None, datetime | None]:
+        """
+        Вычисляет версию списка покупок по строкам агрегата
+        и поколению справочников, в котором хранятся названия
+        и единицы измерения ингредиентов.
+        """
+        self.shopping_list_version: str = (
+            ShoppingListItem.objects
+            .filter(user=request.user)
+            .get_version()
+        )
+        return self.shopping_list_version, None
 
-    def download_shopping_cart(self, request: Request):
+    def get_cache_control(self, request: Request) -> dict[str, Any]:
+        """Разрешает хранить файл только в кэше пользователя."""
+        return {'no_cache': True, 'private': True}
+
+    def get_shopping_cart_file(
+            self, request: Request
+    ) -> HttpResponse | StreamingHttpResponse | Response:
+        """
+        Возвращает файл списка покупок из кэша по версии списка
+        или формирует его, передавая клиенту и сохраняя в кэш.
+        Файл списка больше SHOPPING_LIST_SYNC_MAX_ITEMS ингредиентов
+        в запросе не формируется.
+        """
+        headers: dict[str, str] = {
+            'Content-Disposition': content_disposition_header(
+                as_attachment=True, filename='Список покупок.xls'
+            ),
+        }
+        content: bytes | None = shopping_list_files.get(
+            self.shopping_list_version
+        )
+        if content is not None:
+            return HttpResponse(
+                content, content_type='application/vnd.ms-excel',
+                headers=headers
+            )
+        items: QuerySet = ShoppingListItem.objects.filter(user=request.user)
+        if items.count() > settings.SHOPPING_LIST_SYNC_MAX_ITEMS:
+            return Response(
+                {
+                    'detail': (
+                        'Список покупок слишком большой. Запросите '
+                        'формирование файла методом POST.'
+                    )
+                },
+                status=status.HTTP_409_CONFLICT
+            )
+        chunks: Iterator[bytes] = shopping_list_files.store_chunks(
+            self.shopping_list_version,
+            get_xls_shopping_cart(items.for_export().iterator())
+        )
+        return StreamingHttpResponse(
+            chunks, content_type='application/vnd.ms-excel', headers=headers
+        )
+
+    def download_shopping_cart(
+            self, request: Request
+    ) -> HttpResponseBase:
         """
         Метод для скачивания списка покупок
         в формате Excel (XLS) при GET запросе.
+        Файл передается клиенту блоками по мере формирования;
+        повторная загрузка той же версии списка отдается из кэша
+        или отвечает 304 по ETag.
         """
-        ingredients: QuerySet = (
-            ShoppingCart.objects
+        return self.get_conditional_response(
+            self.get_shopping_cart_file, request
+        )
+
+    def start_export(self, request: Request) -> Response:
+        """
+        Ставит в очередь формирование файла списка покупок
+        в фоне и возвращает задачу со ссылкой на ее статус.
+        Для неизменившегося списка возвращается существующая задача.
+        """
+        export: ShoppingListExport = start_export(request.user)
+        return Response(
+            ShoppingListExportSerializer(
+                export, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                'Location': reverse(
+                    'shopping_list_export', args=(export.pk,),
+                    request=request
+                )
+            }
+        )
+
+    def export_status(self, request: Request, pk: int) -> Response:
+        """
+        Возвращает статус задачи формирования файла,
+        а для готовой задачи - перенаправление на файл.
+        """
+        export: ShoppingListExport = get_object_or_404(
+            ShoppingListExport, pk=pk, user=request.user
+        )
+        if export.status == ShoppingListExport.Status.DONE:
+            return Response(
+                status=status.HTTP_303_SEE_OTHER,
+                headers={'Location': request.build_absolute_uri(
+                    export.file.url
+                )}
+            )
+        return Response(
+            ShoppingListExportSerializer(
+                export, context=self.get_serializer_context()
+            ).data
+        )
+
+    def shopping_list(self, request: Request) -> Response:
+        """
+        Возвращает список покупок текущего пользователя:
+        ингредиенты рецептов из корзины и их суммарное количество.
+        """
+        items: QuerySet = (
+            ShoppingListItem.objects
             .filter(user=request.user)
-            .get_ingredients_shoppingcart()
+            .select_related('ingredient')
+            .order_by('ingredient__name')
         )
-        buffer: BytesIO = get_xls_shopping_cart(ingredients)
-        return FileResponse(buffer, filename='Список покупок.xls')
+        return Response(ShoppingListItemSerializer(items, many=True).data)
 
 
 class FavoriteRecipeViewSet(UserRecipeViewSet, ModelViewSet):
@@ -129,6 +365,7 @@ class FollowViewSet(ModelViewSet):
     serializer_class = FollowSerializer
     http_method_names = ['get', 'post', 'delete']
     permission_classes = [IsAuthenticated]
+    cursor_fields = ('date_added', 'id')
 
     def get_queryset(self) -> QuerySet:
         """
@@ -145,8 +382,7 @@ class FollowViewSet(ModelViewSet):
                         user=self.request.user,
                         following=OuterRef('pk')
                     )
-                ),
-                recipes_count=Count('following__recipes')
+                )
             )
         )
 
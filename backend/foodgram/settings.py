@@ -87,6 +87,109 @@ DATABASES = {
 }
 
 
+# Cache
+# Кэш должен быть общим для всех процессов (Redis): в нем хранятся
+# поколения данных, которые увеличивают и воркеры gunicorn, и команды
+# manage.py. Кэш в памяти процесса допустим только при DEBUG=True,
+# иначе сервер не запускается (см. foodgram/wsgi.py).
+CACHES = {
+    'default': {
+        'BACKEND': getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Время жизни (в секундах) закэшированных ответов о рецептах
+# для анонимных пользователей.
+RECIPES_CACHE_TIMEOUT = int(getenv('RECIPES_CACHE_TIMEOUT', 60 * 60))
+# Формировать представления рецептов напрямую из строк .values()
+# без полей DRF (RecipeFastReadSerializer).
+FAST_RECIPE_SERIALIZER = getenv('FAST_RECIPE_SERIALIZER', 'True') == 'True'
+
+# Период полураспада (в секундах) вклада добавлений в избранное и корзину
+# в оценку популярности рецептов.
+TRENDING_HALF_LIFE = int(getenv('TRENDING_HALF_LIFE', 24 * 60 * 60))
+# Количество периодов полураспада, за которое учитываются события
+# при пересчете оценки популярности командой rebase_trending.
+TRENDING_HORIZON = int(getenv('TRENDING_HORIZON', 14))
+# Количество популярных рецептов в ответе по умолчанию и максимальное.
+TRENDING_DEFAULT_LIMIT = 10
+TRENDING_MAX_LIMIT = 100
+
+# Размеры (ширина, высота) уменьшенных вариантов обложек рецептов:
+# 'card' - для списков рецептов, 'thumb' - для карточек в подписках,
+# избранном и корзине. Формат вариантов - WEBP или JPEG.
+RECIPE_IMAGE_VARIANTS = {
+    'card': (600, 400),
+    'thumb': (300, 200),
+}
+RECIPE_IMAGE_VARIANT_FORMAT = getenv('RECIPE_IMAGE_VARIANT_FORMAT', 'WEBP')
+RECIPE_IMAGE_VARIANT_QUALITY = int(
+    getenv('RECIPE_IMAGE_VARIANT_QUALITY', 80)
+)
+# Наибольший размер (в байтах) и количество пикселей загружаемой обложки.
+RECIPE_IMAGE_MAX_SIZE = int(getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+# Время (в секундах) после сохранения файла изображения, в течение
+# которого команда delete_orphan_images не удаляет его, даже если
+# на него не ссылается ни один рецепт.
+IMAGE_ORPHAN_GRACE_PERIOD = int(
+    getenv('IMAGE_ORPHAN_GRACE_PERIOD', 24 * 60 * 60)
+)
+# Количество потоков процесса, формирующих варианты обложек в фоне.
+RECIPE_IMAGE_WORKERS = int(getenv('RECIPE_IMAGE_WORKERS', 2))
+
+# Наибольшее количество рецептов в запросе пакетного создания.
+RECIPE_BULK_MAX_SIZE = int(getenv('RECIPE_BULK_MAX_SIZE', 100))
+
+# Бэкенд полнотекстового поиска рецептов: PostgresSearchBackend
+# (tsvector + GIN) или InMemorySearchBackend (обратный индекс в памяти
+# процесса для тестов и небольших установок).
+SEARCH_BACKEND = getenv(
+    'SEARCH_BACKEND', 'recipes.search.PostgresSearchBackend'
+)
+# Конфигурация текстового поиска PostgreSQL.
+SEARCH_CONFIG = getenv('SEARCH_CONFIG', 'russian')
+
+# Количество ингредиентов в ответе поиска с учетом опечаток
+# (?fuzzy=1) по умолчанию и максимальное.
+INGREDIENT_SEARCH_DEFAULT_LIMIT = 10
+INGREDIENT_SEARCH_MAX_LIMIT = 50
+# Минимальная доля триграмм запроса, общих с названием ингредиента,
+# при поиске с учетом опечаток.
+INGREDIENT_SIMILARITY_THRESHOLD = float(
+    getenv('INGREDIENT_SIMILARITY_THRESHOLD', 0.4)
+)
+
+# Размер блока (в байтах) и количество блоков в очереди
+# при потоковой передаче файла списка покупок.
+XLSX_STREAM_CHUNK_SIZE = 64 * 1024
+XLSX_STREAM_QUEUE_SIZE = 8
+# Суммарный размер (в байтах) файлов списков покупок в кэше процесса
+# и максимальный размер одного файла в кэше.
+SHOPPING_LIST_CACHE_MAX_SIZE = int(
+    getenv('SHOPPING_LIST_CACHE_MAX_SIZE', 32 * 1024 * 1024)
+)
+SHOPPING_LIST_CACHE_MAX_ITEM_SIZE = int(
+    getenv('SHOPPING_LIST_CACHE_MAX_ITEM_SIZE', 2 * 1024 * 1024)
+)
+# Наибольшее количество ингредиентов списка покупок, для которого
+# файл формируется в запросе GET; файл большего списка формируется
+# в фоне по запросу POST.
+SHOPPING_LIST_SYNC_MAX_ITEMS = int(
+    getenv('SHOPPING_LIST_SYNC_MAX_ITEMS', 500)
+)
+# Количество потоков процесса, формирующих файлы списков покупок в фоне,
+# и время (в секундах), после которого незавершенная задача
+# считается потерянной.
+SHOPPING_LIST_EXPORT_WORKERS = int(getenv('SHOPPING_LIST_EXPORT_WORKERS', 2))
+SHOPPING_LIST_EXPORT_TIMEOUT = int(
+    getenv('SHOPPING_LIST_EXPORT_TIMEOUT', 10 * 60)
+)
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,7 +217,7 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': (
-        'rest_framework.pagination.LimitOffsetPagination'
+        'api.paginations.CursorLimitOffsetPagination'
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -125,6 +228,14 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Таблицы без фильтров, в которых по статистике планировщика больше строк,
+# чем это значение, отдаются с приблизительным количеством объектов.
+APPROXIMATE_COUNT_THRESHOLD = int(
+    getenv('APPROXIMATE_COUNT_THRESHOLD', 100000)
+)
+# Время жизни (в секундах) кэша количества объектов отфильтрованных списков.
+COUNT_CACHE_TIMEOUT = int(getenv('COUNT_CACHE_TIMEOUT', 30))
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserSerializer',
@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.forms import ModelForm
+from django.http import HttpRequest
 
 from .models import Ingredient, Tag, Recipe, RecipeIngredient
-from users.models import FavoriteRecipe
+from users.models import ShoppingListItem
 
 
 @admin.register(Ingredient)
@@ -59,12 +61,28 @@ class RecipeAdmin(admin.ModelAdmin):
     fields = (
         'name', 'author', 'image',
         'text', 'tags', 'cooking_time',
-        'favorites_count',
+        'favorites_count', 'in_carts_count',
     )
-    readonly_fields = ('favorites_count',)
+    readonly_fields = ('favorites_count', 'in_carts_count',)
 
-    def favorites_count(self, instance: Recipe) -> int:
-        """Возвращает количество добавлений рецепта в избранное."""
-        return FavoriteRecipe.objects.filter(recipe=instance).count()
-
-    favorites_count.short_description = 'Количество добавлений в избранное'
+    def save_related(
+            self, request: HttpRequest, form: ModelForm,
+            formsets: list, change: bool
+    ) -> None:
+        """
+        Сохраняет ингредиенты рецепта и применяет их изменение
+        к спискам покупок пользователей, у которых рецепт в корзине.
+        """
+        recipe: Recipe = form.instance
+        old_amounts: dict[int, int] = dict(
+            RecipeIngredient.objects.filter(recipe=recipe)
+            .values_list('ingredient_id', 'amount')
+        )
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.change_recipe(
+            recipe.pk, old_amounts,
+            dict(
+                RecipeIngredient.objects.filter(recipe=recipe)
+                .values_list('ingredient_id', 'amount')
+            )
+        )
@@ -5,3 +5,7 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов приложения."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import Tag
+
+RECIPES_GENERATION_KEY = 'recipes:generation'
+CATALOG_GENERATION_KEY = 'catalog:generation'
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_tag_bits: dict[str, tuple[int, dict[str, int]]] = {}
+
+
+def is_cache_shared() -> bool:
+    """Проверяет, что кэш по умолчанию общий для всех процессов."""
+    return (
+        settings.CACHES['default']['BACKEND']
+        not in PROCESS_LOCAL_CACHE_BACKENDS
+    )
+
+
+def check_shared_cache() -> None:
+    """
+    Останавливает запуск сервера с кэшем в памяти процесса.
+    Поколения данных в кэше памяти процесса не видны другим процессам:
+    увеличение поколения командой manage.py или другим воркером
+    не сбрасывает закэшированные ответы. Кэш в памяти процесса
+    допускается только при DEBUG=True.
+    """
+    if not is_cache_shared() and not settings.DEBUG:
+        raise ImproperlyConfigured(
+            f'Кэш {settings.CACHES["default"]["BACKEND"]} '
+            'не является общим для процессов. '
+            'Укажите общий кэш в переменных CACHE_BACKEND '
+            'и CACHE_LOCATION, например Redis.'
+        )
+
+
+def get_generation(key: str) -> int:
+    """
+    Возвращает текущее поколение данных по ключу кэша.
+    Начальное значение берется из текущего времени, чтобы после очистки
+    кэша поколение не совпало ни с одним из использованных ранее.
+    """
+    generation: int | None = cache.get(key)
+    if generation is None:
+        cache.add(key, time_ns() // 1000, None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key: str) -> None:
+    """
+    Увеличивает поколение данных по ключу кэша,
+    делая недействительными все зависящие от него записи.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_generation(key)
+
+
+def get_recipes_generation() -> int:
+    """Возвращает текущее поколение данных о рецептах."""
+    return get_generation(RECIPES_GENERATION_KEY)
+
+
+def bump_recipes_generation() -> None:
+    """
+    Увеличивает поколение данных о рецептах,
+    делая недействительными все закэшированные ответы.
+    """
+    bump_generation(RECIPES_GENERATION_KEY)
+
+
+def get_catalog_generation() -> int:
+    """Возвращает текущее поколение справочников тегов и ингредиентов."""
+    return get_generation(CATALOG_GENERATION_KEY)
+
+
+def bump_catalog_generation() -> None:
+    """Увеличивает поколение справочников тегов и ингредиентов."""
+    bump_generation(CATALOG_GENERATION_KEY)
+
+
+def get_tag_bits() -> dict[str, int]:
+    """
+    Возвращает словарь битов маски тегов по их slug.
+    Словарь хранится в памяти процесса и загружается заново
+    после изменения поколения справочников.
+    """
+    generation: int = get_catalog_generation()
+    cached: tuple[int, dict[str, int]] | None = _tag_bits.get('map')
+    if cached is None or cached[0] != generation:
+        cached = (generation, dict(Tag.objects.values_list('slug', 'bit')))
+        _tag_bits['map'] = cached
+    return cached[1]
@@ -0,0 +1,143 @@
+"""
+Уменьшенные варианты изображений рецептов.
+
+Варианты фиксированных размеров из настройки RECIPE_IMAGE_VARIANTS
+формируются в пуле потоков процесса после фиксации транзакции,
+в которой изображение рецепта было загружено или заменено,
+и сохраняются в хранилище рядом с оригиналом. Пути к вариантам
+записываются в поле Recipe.image_variants вместе с именем исходного
+файла ('source'), поэтому варианты устаревшего изображения
+не используются и повторно для того же изображения не формируются.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+from logging import getLogger
+from posixpath import join
+from typing import Iterable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_recipes_generation
+from .models import ImageBlob, Recipe
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+logger = getLogger(__name__)
+
+
+@cache
+def get_image_executor() -> ThreadPoolExecutor:
+    """Возвращает пул потоков для формирования вариантов изображений."""
+    return ThreadPoolExecutor(
+        max_workers=settings.RECIPE_IMAGE_WORKERS,
+        thread_name_prefix='recipe-image-variants',
+    )
+
+
+def has_actual_variants(image_name: str, variants: dict[str, str]) -> bool:
+    """Проверяет, сформированы ли варианты для текущего изображения."""
+    return bool(image_name) and variants.get('source') == image_name
+
+
+def render_variant(image: Image.Image, size: tuple[int, int]) -> bytes:
+    """
+    Вписывает изображение в размер с обрезкой по центру
+    и возвращает его в формате RECIPE_IMAGE_VARIANT_FORMAT.
+    """
+    variant: Image.Image = ImageOps.fit(image, size, Image.LANCZOS)
+    if settings.RECIPE_IMAGE_VARIANT_FORMAT == 'JPEG':
+        variant = variant.convert('RGB')
+    elif variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA')
+    buffer: BytesIO = BytesIO()
+    variant.save(
+        buffer,
+        settings.RECIPE_IMAGE_VARIANT_FORMAT,
+        quality=settings.RECIPE_IMAGE_VARIANT_QUALITY,
+    )
+    return buffer.getvalue()
+
+
+def generate_image_variants(recipe_id: int, force: bool = False) -> bool:
+    """
+    Формирует варианты изображения рецепта и возвращает True,
+    если они были записаны. Варианты сохраняются, только если
+    изображение рецепта не изменилось за время их формирования;
+    ссылки на файлы прежних вариантов освобождаются, а сами файлы
+    удаляет команда delete_orphan_images. Поколение данных о рецептах
+    увеличивает вызывающий код.
+    """
+    recipe: Recipe | None = (
+        Recipe.objects.only('id', 'image', 'image_variants')
+        .filter(pk=recipe_id).first()
+    )
+    if recipe is None or not recipe.image:
+        return False
+    if not force and has_actual_variants(
+        recipe.image.name, recipe.image_variants
+    ):
+        return False
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as file:
+        image: Image.Image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    directory: str = recipe.image.field.upload_to
+    extension: str = FORMAT_EXTENSIONS[settings.RECIPE_IMAGE_VARIANT_FORMAT]
+    variants: dict[str, str] = {'source': recipe.image.name}
+    for name, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        variants[name] = storage.save(
+            join(directory, f'{name}.{extension}'),
+            ContentFile(render_variant(image, size))
+        )
+    with transaction.atomic():
+        stored: Recipe | None = (
+            Recipe.objects.select_for_update().only('image_variants')
+            .filter(pk=recipe_id, image=recipe.image.name).first()
+        )
+        if stored is None:
+            return False
+        Recipe.objects.filter(pk=recipe_id).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+        ImageBlob.objects.retain(Recipe.get_variant_names(variants))
+        ImageBlob.objects.release(
+            Recipe.get_variant_names(stored.image_variants)
+        )
+    return True
+
+
+def run_image_variants(recipe_id: int) -> None:
+    """
+    Формирует варианты изображения в потоке пула
+    и увеличивает поколение данных о рецептах.
+    """
+    try:
+        if generate_image_variants(recipe_id):
+            bump_recipes_generation()
+    except Exception:
+        logger.exception(
+            'Не удалось сформировать варианты изображения рецепта %s.',
+            recipe_id
+        )
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe_ids: Iterable[int]) -> None:
+    """
+    Ставит в очередь пула формирование вариантов изображений
+    рецептов после фиксации текущей транзакции.
+    """
+    recipe_ids = list(recipe_ids)
+
+    def submit() -> None:
+        executor: ThreadPoolExecutor = get_image_executor()
+        for recipe_id in recipe_ids:
+            executor.submit(run_image_variants, recipe_id)
+
+    transaction.on_commit(submit)
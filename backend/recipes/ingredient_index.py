@@ -0,0 +1,205 @@
+"""
+Индекс ингредиентов в памяти процесса для автодополнения.
+
+Справочник ингредиентов небольшой и меняется редко, поэтому он
+хранится в памяти целиком в виде отсортированного массива нормализованных
+названий. Поиск по префиксу выполняется двоичным поиском без обращения
+к базе данных. Для поиска с опечатками хранится обратный индекс
+триграмм названий: кандидаты и их сходство с запросом вычисляются
+по спискам позиций триграмм запроса, без перебора всего справочника.
+Индекс загружается при первом обращении и строится заново
+после изменения поколения справочников.
+"""
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any
+
+from .cache import get_catalog_generation
+from .models import Ingredient
+
+WORD_PATTERN = re.compile(r'\w+')
+
+_ingredient_index: dict[str, tuple[int, 'IngredientIndex']] = {}
+
+
+def normalize(value: str) -> str:
+    """Приводит строку к виду для сравнения: casefold и замена ё на е."""
+    return value.casefold().replace('ё', 'е')
+
+
+def get_trigrams(value: str, padded_end: bool = True) -> set[str]:
+    """
+    Возвращает триграммы слов нормализованной строки.
+    Слово дополняется двумя пробелами в начале и одним в конце,
+    как в pg_trgm; для запроса, который может быть началом слова,
+    пробел в конце не добавляется.
+    """
+    end: str = ' ' if padded_end else ''
+    trigrams: set[str] = set()
+    for word in value.split():
+        padded: str = f'  {word}{end}'
+        trigrams.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return trigrams
+
+
+def get_prefix_distance(query: str, word: str) -> int:
+    """
+    Возвращает наименьшее расстояние Левенштейна между запросом
+    и началом слова любой длины.
+    """
+    row: list[int] = list(range(len(word) + 1))
+    for index, char in enumerate(query, 1):
+        previous: list[int] = row
+        row = [index]
+        for position, other in enumerate(word, 1):
+            row.append(
+                min(
+                    previous[position] + 1,
+                    row[position - 1] + 1,
+                    previous[position - 1] + (char != other),
+                )
+            )
+    return min(row)
+
+
+def get_words(value: str) -> list[str]:
+    """Возвращает слова нормализованной строки без знаков препинания."""
+    return WORD_PATTERN.findall(value)
+
+
+class IngredientIndex:
+    """
+    Отсортированный массив нормализованных названий ингредиентов
+    и их представлений в ответе API с обратным индексом триграмм.
+    """
+    min_substring_length = 3
+    max_fuzzy_candidates = 100
+
+    def __init__(self, rows: list[tuple[int, str, str]]) -> None:
+        entries: list[tuple[str, int, dict[str, Any]]] = sorted(
+            (
+                normalize(name),
+                pk,
+                {'id': pk, 'name': name, 'measurement_unit': unit},
+            )
+            for pk, name, unit in rows
+        )
+        self.keys: tuple[str, ...] = tuple(entry[0] for entry in entries)
+        self.items: tuple[dict[str, Any], ...] = tuple(
+            entry[2] for entry in entries
+        )
+        self.words: tuple[tuple[str, ...], ...] = tuple(
+            tuple(get_words(key)) for key in self.keys
+        )
+        postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        sizes: dict[tuple[int, int], int] = {}
+        for position, words in enumerate(self.words):
+            for number, word in enumerate(words):
+                trigrams: set[str] = get_trigrams(word)
+                for trigram in trigrams:
+                    postings[trigram].append((position, number))
+                sizes[position, number] = len(trigrams)
+        self.postings: dict[str, tuple[tuple[int, int], ...]] = {
+            trigram: tuple(words) for trigram, words in postings.items()
+        }
+        self.sizes: dict[tuple[int, int], int] = sizes
+
+    @classmethod
+    def load(cls) -> 'IngredientIndex':
+        """Строит индекс по всем ингредиентам из базы данных."""
+        return cls(
+            list(
+                Ingredient.objects.order_by().values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+        )
+
+    def get_prefix_range(self, prefix: str) -> range:
+        """Возвращает позиции названий, начинающихся с префикса."""
+        start: int = bisect_left(self.keys, prefix)
+        return range(
+            start, bisect_left(self.keys, prefix + '\U0010ffff', start)
+        )
+
+    def startswith(self, prefix: str) -> list[dict[str, Any]]:
+        """Возвращает ингредиенты, название которых начинается с префикса."""
+        positions: range = self.get_prefix_range(normalize(prefix))
+        return list(self.items[positions.start:positions.stop])
+
+    def search(
+            self, query: str, limit: int, threshold: float
+    ) -> list[dict[str, Any]]:
+        """
+        Возвращает до 'limit' ингредиентов, найденных с учетом опечаток:
+        сначала совпадения по префиксу, затем по подстроке,
+        затем названия со словом, похожим на запрос. Похожесть слова -
+        доля триграмм запроса, встречающихся в слове (не ниже
+        'threshold'); не более 'max_fuzzy_candidates' лучших
+        по похожести кандидатов упорядочиваются по расстоянию
+        редактирования между запросом и началом слова, затем
+        по номеру слова в названии.
+        """
+        query = normalize(query).strip()
+        positions: list[int] = list(self.get_prefix_range(query)[:limit])
+        if len(positions) >= limit or len(query) < self.min_substring_length:
+            return [self.items[position] for position in positions]
+        found: set[int] = set(positions)
+        trigrams: set[str] = get_trigrams(query, padded_end=False)
+        shared: Counter = Counter()
+        for trigram in trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        substring: list[int] = sorted(
+            {
+                position for position, _ in shared
+                if position not in found and query in self.keys[position]
+            }
+        )
+        positions.extend(substring[:limit - len(positions)])
+        found.update(substring)
+        best: dict[int, tuple[float, tuple[int, int]]] = {}
+        for word, count in shared.items():
+            position: int = word[0]
+            similarity: float = count / len(trigrams)
+            if position in found or similarity < threshold:
+                continue
+            if similarity > best.get(position, (0,))[0]:
+                best[position] = (similarity, word)
+        candidates: list[int] = sorted(
+            best, key=lambda position: (-best[position][0], position)
+        )[:self.max_fuzzy_candidates]
+        word_distances: dict[str, int] = {}
+        distances: dict[int, int] = {}
+        for position in candidates:
+            word: str = self.words[position][best[position][1][1]]
+            if word not in word_distances:
+                word_distances[word] = get_prefix_distance(
+                    query, word[:len(query) + 2]
+                )
+            distances[position] = word_distances[word]
+        candidates.sort(
+            key=lambda position: (
+                distances[position], best[position][1][1],
+                -best[position][0], position
+            )
+        )
+        positions.extend(candidates[:limit - len(positions)])
+        return [self.items[position] for position in positions]
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """
+    Возвращает индекс ингредиентов, загружая его заново
+    после изменения поколения справочников.
+    """
+    generation: int = get_catalog_generation()
+    cached: tuple[int, IngredientIndex] | None = _ingredient_index.get(
+        'index'
+    )
+    if cached is None or cached[0] != generation:
+        cached = (generation, IngredientIndex.load())
+        _ingredient_index['index'] = cached
+    return cached[1]
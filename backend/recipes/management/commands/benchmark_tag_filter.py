@@ -0,0 +1,64 @@
+from timeit import repeat
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cache import get_tag_bits
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает фильтрацию рецептов по тегам через соединение
+    со связующей таблицей и через битовую маску тегов рецепта.
+    """
+    help = 'Замеряет время фильтрации рецептов по тегам.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            'slugs', nargs='*',
+            help='Слаги тегов; по умолчанию используются все теги.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов замера.',
+        )
+        parser.add_argument(
+            '--number', type=int, default=10,
+            help='Количество запросов в одном замере.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Количество рецептов на странице.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Выполняет замеры и выводит лучшее время на запрос."""
+        tag_bits: dict[str, int] = get_tag_bits()
+        slugs: list[str] = options['slugs'] or list(tag_bits)
+        unknown: set[str] = set(slugs) - set(tag_bits)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные теги: {", ".join(sorted(unknown))}'
+            )
+        bits: list[int] = [tag_bits[slug] for slug in slugs]
+        limit: int = options['limit']
+        variants = (
+            ('join', lambda: list(
+                Recipe.objects.filter(tags__slug__in=slugs)
+                .distinct().values_list('pk', flat=True)[:limit]
+            )),
+            ('bitmask', lambda: list(
+                Recipe.objects.filter_tags(bits)
+                .values_list('pk', flat=True)[:limit]
+            )),
+        )
+        for name, query in variants:
+            best: float = min(
+                repeat(
+                    query,
+                    repeat=options['repeat'],
+                    number=options['number'],
+                )
+            ) / options['number']
+            self.stdout.write(f'{name}: {best * 1000:.3f} мс на запрос')
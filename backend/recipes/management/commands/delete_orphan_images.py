@@ -0,0 +1,92 @@
+from collections import Counter
+from time import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ImageBlob, Recipe
+
+
+class Command(BaseCommand):
+    """
+    Удаляет из хранилища изображений, адресуемого по содержимому,
+    файлы, на которые не ссылается ни один рецепт. Файл удаляется,
+    только если он не сохранялся дольше IMAGE_ORPHAN_GRACE_PERIOD:
+    ссылка на недавно сохраненный файл может быть еще
+    не зафиксирована.
+    """
+    help = 'Удаляет файлы изображений, на которые не ссылаются рецепты.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--grace-period',
+            type=int,
+            default=settings.IMAGE_ORPHAN_GRACE_PERIOD,
+            help='Время (в секундах) после сохранения, в течение '
+                 'которого файл без ссылок не удаляется.',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Пересчитать счетчики ссылок по рецептам перед удалением.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести количество файлов без ссылок.',
+        )
+
+    @transaction.atomic
+    def recount(self) -> int:
+        """
+        Сверяет счетчики ссылок с именами файлов в рецептах,
+        исправляет расхождения и возвращает количество исправленных.
+        """
+        counts: Counter = Counter()
+        for image, variants in (
+            Recipe.objects.values_list('image', 'image_variants').iterator()
+        ):
+            counts.update(
+                Recipe(image=image, image_variants=variants)
+                .get_image_names()
+            )
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name) for name in sorted(counts)],
+            ignore_conflicts=True,
+        )
+        drifted: list[ImageBlob] = []
+        for blob in ImageBlob.objects.select_for_update().iterator():
+            if blob.ref_count != counts[blob.name]:
+                blob.ref_count = counts[blob.name]
+                drifted.append(blob)
+        ImageBlob.objects.bulk_update(drifted, ['ref_count'], batch_size=1000)
+        return len(drifted)
+
+    def handle(self, *args, **options) -> None:
+        """Удаляет файлы без ссылок и выводит их количество."""
+        if options['recount']:
+            self.stdout.write(f'Исправлено счетчиков: {self.recount()}')
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        referenced: set[str] = set(
+            ImageBlob.objects.filter(ref_count__gt=0)
+            .values_list('name', flat=True)
+        )
+        modified_before: float = time() - options['grace_period']
+        orphans: list[str] = [
+            name for name in storage.list_blobs(field.upload_to)
+            if name not in referenced
+        ]
+        if options['dry_run']:
+            self.stdout.write(f'Файлов без ссылок: {len(orphans)}')
+            return
+        deleted: list[str] = [
+            name for name in orphans
+            if storage.delete_unused(name, modified_before)
+        ]
+        ImageBlob.objects.filter(name__in=deleted, ref_count=0).delete()
+        self.stdout.write(
+            f'Файлов без ссылок: {len(orphans)}, удалено: {len(deleted)}'
+        )
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.cache import bump_recipes_generation
+from recipes.images import generate_image_variants, has_actual_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Формирует уменьшенные варианты обложек существующих рецептов,
+    у которых их нет или они сформированы для прежней обложки.
+    Изображения обрабатываются в пуле потоков; поколение данных
+    о рецептах увеличивается один раз в конце.
+    """
+    help = 'Формирует уменьшенные варианты обложек рецептов.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Количество потоков, обрабатывающих изображения.',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Сформировать варианты заново для всех рецептов.',
+        )
+
+    def generate(self, recipe_id: int, force: bool) -> bool:
+        """
+        Формирует варианты изображения рецепта в потоке пула.
+        Ошибка обработки одного изображения выводится
+        и не прерывает обработку остальных.
+        """
+        try:
+            return generate_image_variants(recipe_id, force)
+        except Exception as error:
+            self.stderr.write(f'Рецепт {recipe_id}: {error}')
+            return False
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options) -> None:
+        """Формирует недостающие варианты и выводит их количество."""
+        force: bool = options['force']
+        recipe_ids: list[int] = [
+            recipe_id
+            for recipe_id, image, variants in (
+                Recipe.objects.exclude(image='')
+                .values_list('id', 'image', 'image_variants')
+                .iterator()
+            )
+            if force or not has_actual_variants(image, variants)
+        ]
+        started: float = perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            generated: int = sum(
+                executor.map(
+                    self.generate, recipe_ids, [force] * len(recipe_ids)
+                )
+            )
+        if generated:
+            bump_recipes_generation()
+        self.stdout.write(
+            f'Рецептов без актуальных вариантов: {len(recipe_ids)}, '
+            f'обработано: {generated} за {perf_counter() - started:.2f} с'
+        )
@@ -0,0 +1,209 @@
+from json import JSONDecodeError, JSONDecoder
+from time import perf_counter
+from typing import Any, Iterator, TextIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import (
+    bump_catalog_generation, bump_recipes_generation, is_cache_shared
+)
+from recipes.models import TAG_MASK_BITS, Ingredient, Recipe, Tag
+
+WHITESPACE = ' \t\r\n'
+
+
+def iter_fixture_objects(
+        file: TextIO, chunk_size: int
+) -> Iterator[dict[str, Any]]:
+    """
+    Потоково, не загружая файл целиком, читает объекты
+    из JSON-массива фикстуры Django.
+    """
+    decoder: JSONDecoder = JSONDecoder()
+    buffer: str = ''
+    started: bool = False
+    while True:
+        chunk: str = file.read(chunk_size)
+        buffer += chunk
+        position: int = 0
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            char: str = buffer[position]
+            if not started:
+                if char != '[':
+                    raise CommandError('Фикстура должна быть JSON-массивом.')
+                started = True
+                position += 1
+                continue
+            if char == ',':
+                position += 1
+                continue
+            if char == ']':
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный JSON в фикстуре.')
+                break
+            if not isinstance(obj, dict):
+                raise CommandError('Элемент фикстуры должен быть объектом.')
+            yield obj
+            position = end
+        buffer = buffer[position:]
+        if not chunk:
+            raise CommandError('Фикстура обрывается до конца массива.')
+
+
+class Command(BaseCommand):
+    """
+    Загружает теги и ингредиенты из фикстур Django (data/*.json, data/*.csv)
+    пакетами по естественным ключам: slug тега, название и единица
+    измерения ингредиента. Файл читается потоково, в памяти хранится
+    один пакет. Существующие ингредиенты пропускаются, у существующих
+    тегов обновляются название и цвет, поэтому повторный запуск
+    на заполненной базе только читает ключи. Запущенный сервер видит
+    загруженные данные сразу, только если кэш общий для процессов:
+    команда увеличивает поколения справочников и рецептов в кэше.
+    """
+    help = 'Загружает теги и ингредиенты из фикстур пакетами.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            'fixtures', nargs='+',
+            help='Пути к файлам фикстур.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество объектов, записываемых одним запросом.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=64 * 1024,
+            help='Количество символов, читаемых из файла за раз.',
+        )
+
+    def load_ingredients(self, rows: list[dict[str, Any]]) -> int:
+        """Создает отсутствующие ингредиенты пакета."""
+        keys: dict[tuple[str, str], Ingredient] = {
+            (row['name'], row['measurement_unit']): Ingredient(
+                name=row['name'], measurement_unit=row['measurement_unit']
+            )
+            for row in rows
+        }
+        existing: set[tuple[str, str]] = set(
+            Ingredient.objects
+            .filter(name__in={name for name, _ in keys})
+            .values_list('name', 'measurement_unit')
+        )
+        missing: list[Ingredient] = [
+            ingredient for key, ingredient in keys.items()
+            if key not in existing
+        ]
+        Ingredient.objects.bulk_create(missing, ignore_conflicts=True)
+        return len(missing)
+
+    def load_tags(self, rows: list[dict[str, Any]]) -> int:
+        """
+        Создает отсутствующие теги пакета с назначением битов маски
+        и обновляет название и цвет существующих.
+        """
+        fields: dict[str, dict[str, Any]] = {row['slug']: row for row in rows}
+        existing: dict[str, Tag] = Tag.objects.in_bulk(
+            fields, field_name='slug'
+        )
+        changed: list[Tag] = []
+        for slug, tag in existing.items():
+            if (tag.name, tag.color) != (
+                fields[slug]['name'], fields[slug]['color']
+            ):
+                tag.name = fields[slug]['name']
+                tag.color = fields[slug]['color']
+                changed.append(tag)
+        used: set[int] = set(Tag.objects.values_list('bit', flat=True))
+        free: Iterator[int] = (
+            bit for bit in range(TAG_MASK_BITS) if bit not in used
+        )
+        created: list[Tag] = []
+        for slug, row in fields.items():
+            if slug in existing:
+                continue
+            bit: int | None = next(free, None)
+            if bit is None:
+                raise CommandError(
+                    f'Нельзя создать больше {TAG_MASK_BITS} тегов.'
+                )
+            created.append(
+                Tag(name=row['name'], color=row['color'], slug=slug, bit=bit)
+            )
+        Tag.objects.bulk_create(created)
+        Tag.objects.bulk_update(changed, ['name', 'color'])
+        if changed:
+            Recipe.objects.filter(tags__in=changed).touch()
+        return len(created) + len(changed)
+
+    def report(
+            self, label: str, read: int, written: int, elapsed: float
+    ) -> None:
+        """Выводит количество объектов и скорость загрузки."""
+        self.stdout.write(
+            f'{label}: прочитано {read}, записано {written} '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-9):.0f} объектов/с)'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options) -> None:
+        """Загружает фикстуры и выводит скорость загрузки."""
+        loaders = {
+            'recipes.ingredient': self.load_ingredients,
+            'recipes.tag': self.load_tags,
+        }
+        batch_size: int = options['batch_size']
+        total_read: int = 0
+        total_written: int = 0
+        started: float = perf_counter()
+        for path in options['fixtures']:
+            read: int = 0
+            written: int = 0
+            batches: dict[str, list[dict[str, Any]]] = {
+                label: [] for label in loaders
+            }
+            file_started: float = perf_counter()
+            with open(path, encoding='utf-8') as file:
+                for obj in iter_fixture_objects(file, options['chunk_size']):
+                    label: str = obj.get('model', '').lower()
+                    if label not in loaders:
+                        raise CommandError(
+                            f'{path}: неподдерживаемая модель {label!r}.'
+                        )
+                    batch: list[dict[str, Any]] = batches[label]
+                    batch.append(obj['fields'])
+                    read += 1
+                    if len(batch) == batch_size:
+                        written += loaders[label](batch)
+                        batch.clear()
+            for label, batch in batches.items():
+                if batch:
+                    written += loaders[label](batch)
+            self.report(path, read, written, perf_counter() - file_started)
+            total_read += read
+            total_written += written
+        self.report(
+            'Всего', total_read, total_written, perf_counter() - started
+        )
+        if total_written:
+            transaction.on_commit(bump_catalog_generation)
+            transaction.on_commit(bump_recipes_generation)
+            if not is_cache_shared():
+                self.stderr.write(self.style.WARNING(
+                    'Кэш не является общим для процессов: запущенный '
+                    'сервер не увидит новые данные до перезапуска.'
+                ))
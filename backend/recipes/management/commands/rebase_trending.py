@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import Recipe
+from recipes.trending import add_event_value, get_event_value
+from users.models import FavoriteRecipe, ShoppingCart
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает оценки популярности рецептов по событиям
+    добавления в избранное и корзину за последние TRENDING_HORIZON
+    периодов полураспада. Исправляет накопленную погрешность
+    инкрементальных обновлений и сбрасывает оценки рецептов
+    без недавних событий. Предназначена для периодического запуска.
+    """
+    help = 'Пересчитывает оценки популярности рецептов.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов, обновляемых одним запросом.',
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options) -> None:
+        """Пересчитывает оценки популярности."""
+        since = timezone.now() - timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * settings.TRENDING_HORIZON
+        )
+        scores: dict[int, float] = {}
+        for model in (FavoriteRecipe, ShoppingCart):
+            events = (
+                model.objects
+                .filter(date_added__gte=since)
+                .order_by()
+                .values_list('recipe_id', 'date_added')
+            )
+            for recipe_id, date_added in events.iterator(chunk_size=10000):
+                scores[recipe_id] = add_event_value(
+                    scores.get(recipe_id),
+                    get_event_value(model.trending_weight, date_added)
+                )
+        stale: list[int] = list(
+            set(
+                Recipe.objects
+                .filter(trending_score__isnull=False)
+                .values_list('pk', flat=True)
+            ) - scores.keys()
+        )
+        batch_size: int = options['batch_size']
+        for start in range(0, len(stale), batch_size):
+            Recipe.objects.filter(
+                pk__in=stale[start:start + batch_size]
+            ).update(trending_score=None)
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=recipe_id, trending_score=score)
+                for recipe_id, score in scores.items()
+            ],
+            ['trending_score'],
+            batch_size=batch_size,
+        )
+        self.stdout.write(
+            f'Пересчитано оценок: {len(scores)}, сброшено: {len(stale)}'
+        )
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, QuerySet
+
+from recipes.managers import count_subquery
+from recipes.models import Recipe
+from users.models import FavoriteRecipe, Follow, ShoppingCart, User
+
+
+class Command(BaseCommand):
+    """
+    Сверяет хранимые счетчики рецептов и пользователей
+    с фактическим количеством связанных строк и исправляет расхождения.
+    """
+    help = 'Пересчитывает счетчики избранного, корзин, рецептов и подписчиков.'
+
+    def add_arguments(self, parser) -> None:
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество объектов, обновляемых одним запросом.',
+        )
+
+    def reconcile(
+            self, queryset: QuerySet, field: str,
+            related: QuerySet, related_field: str, batch_size: int
+    ) -> int:
+        """
+        Находит объекты, счетчик которых расходится с агрегатом
+        по связанной таблице, и обновляет их пакетами.
+        """
+        drifted = (
+            queryset
+            .annotate(actual=count_subquery(related, related_field))
+            .exclude(**{field: F('actual')})
+            .values_list('pk', 'actual')
+        )
+        model = queryset.model
+        updated: int = 0
+        batch: list = []
+        for pk, actual in drifted.iterator(chunk_size=batch_size):
+            batch.append(model(pk=pk, **{field: actual}))
+            if len(batch) == batch_size:
+                updated += model.objects.bulk_update(batch, [field])
+                batch = []
+        if batch:
+            updated += model.objects.bulk_update(batch, [field])
+        return updated
+
+    @transaction.atomic
+    def handle(self, *args, **options) -> None:
+        """Пересчитывает все счетчики."""
+        counters = (
+            (Recipe.objects, 'favorites_count',
+             FavoriteRecipe.objects, 'recipe'),
+            (Recipe.objects, 'in_carts_count',
+             ShoppingCart.objects, 'recipe'),
+            (User.objects, 'recipes_count',
+             Recipe.objects, 'author'),
+            (User.objects, 'followers_count',
+             Follow.objects, 'following'),
+        )
+        for queryset, field, related, related_field in counters:
+            updated: int = self.reconcile(
+                queryset.order_by('pk'), field, related, related_field,
+                options['batch_size']
+            )
+            self.stdout.write(
+                f'{queryset.model._meta.model_name}.{field}: '
+                f'исправлено {updated}'
+            )
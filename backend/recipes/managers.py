@@ -1,6 +1,62 @@
-from django.db.models import QuerySet, Manager, Exists, OuterRef, Prefetch
+from django.apps import apps
+from collections import Counter
+from datetime import datetime
+from itertools import groupby
+from typing import Iterable
 
-from users.models import User, Follow
+from django.db.models import (
+    QuerySet, Manager, Exists, OuterRef, Prefetch, Subquery, Count,
+    IntegerField, Case, When, F, Value, FloatField
+)
+from django.db.models.functions import Abs, Coalesce, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .storage import is_blob_name
+from .trending import add_event_value, get_event_value
+
+from users.models import User, Follow, FavoriteRecipe, ShoppingCart
+
+TRENDING_SCORE_EPSILON = 1e-9
+
+
+def count_subquery(queryset: QuerySet, field: str = 'recipe') -> Coalesce:
+    """
+    Возвращает подзапрос с количеством строк, связанных
+    с объектом основного запроса через поле 'field'.
+    Подсчет выполняется агрегатом в базе данных без соединения таблиц,
+    поэтому не размножает строки основного запроса.
+    """
+    return Coalesce(
+        Subquery(
+            queryset
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def trending_removal(value: float) -> Case:
+    """
+    Возвращает выражение оценки популярности без вклада 'value':
+    S = S + ln(1 - exp(v - S)). Если вклад не меньше оценки,
+    она сбрасывается.
+    """
+    return Case(
+        When(
+            trending_score__gt=value + TRENDING_SCORE_EPSILON,
+            then=(
+                F('trending_score')
+                + Ln(Value(1.0) - Exp(Value(value) - F('trending_score')))
+            ),
+        ),
+        default=None,
+        output_field=FloatField(),
+    )
 
 
 class RecipeQuerySet(QuerySet):
@@ -8,15 +64,188 @@ class RecipeQuerySet(QuerySet):
     def related_tables(self) -> 'RecipeQuerySet':
         """
         Отимизирует запрос, присоединяя таблицы.
+        План предварительной загрузки имеет фиксированный размер:
+        по одному запросу на теги и ингредиенты страницы,
+        строки избранного и корзин покупок не загружаются.
         """
         return (
             self
             .prefetch_related(
-                'tags', 'recipeingredient_set__ingredient',
-                'favoriterecipe_set', 'shoppingcart_set',
+                'tags',
+                Prefetch(
+                    'recipeingredient_set',
+                    queryset=(
+                        apps.get_model(
+                            app_label='recipes', model_name='RecipeIngredient'
+                        )
+                        .objects
+                        .select_related('ingredient')
+                        .order_by('id')
+                    )
+                ),
+            )
+        )
+
+    def annotate_user_flags(self, user: User) -> 'RecipeQuerySet':
+        """
+        Аннотирует флаги пользователя для рецептов,
+        проверяя, есть ли рецепт в его списке избранного
+        или корзине покупок и подписан ли он на автора.
+        """
+        return (
+            self
+            .annotate(
+                is_in_shopping_cart=Exists(
+                    queryset=ShoppingCart.objects.filter(
+                        user=user,
+                        recipe=OuterRef('pk')
+                    )
+                ),
+                is_favorited=Exists(
+                    queryset=FavoriteRecipe.objects.filter(
+                        user=user,
+                        recipe=OuterRef('pk')
+                    )
+                ),
+                author_is_subscribed=Exists(
+                    queryset=Follow.objects.filter(
+                        user=user,
+                        following=OuterRef('author')
+                    )
+                ),
+            )
+        )
+
+    def touch(self) -> int:
+        """
+        Обновляет дату изменения рецептов,
+        например при изменении их ингредиентов или тегов.
+        """
+        return self.update(updated_at=timezone.now())
+
+    def update_tags_mask(self) -> None:
+        """
+        Пересчитывает маски тегов рецептов по их текущим тегам.
+        """
+        masks: dict[int, int] = dict.fromkeys(
+            self.values_list('pk', flat=True), 0
+        )
+        for recipe_id, bit in (
+            self.model.tags.through.objects
+            .filter(recipe_id__in=masks.keys())
+            .values_list('recipe_id', 'tag__bit')
+        ):
+            masks[recipe_id] |= 1 << bit
+        self.model.objects.bulk_update(
+            [
+                self.model(pk=recipe_id, tags_mask=mask)
+                for recipe_id, mask in masks.items()
+            ],
+            ['tags_mask']
+        )
+
+    def unset_tag_bit(self, bit: int) -> int:
+        """Снимает бит тега в масках тегов рецептов."""
+        return self.update(tags_mask=F('tags_mask').bitand(~(1 << bit)))
+
+    def filter_tags(self, bits: list[int]) -> 'RecipeQuerySet':
+        """
+        Фильтрует рецепты, у которых есть хотя бы один из тегов,
+        одним побитовым условием по маске тегов без соединения таблиц.
+        """
+        mask: int = 0
+        for bit in bits:
+            mask |= 1 << bit
+        return (
+            self
+            .alias(tags_match=F('tags_mask').bitand(mask))
+            .filter(tags_match__gt=0)
+        )
+
+    def add_trending_event(
+            self, weight: float, moment: datetime
+    ) -> int:
+        """
+        Добавляет к оценке популярности рецептов вклад события
+        одним запросом UPDATE: S = max(S, v) + ln(1 + exp(-|S - v|)).
+        """
+        value: Value = Value(get_event_value(weight, moment))
+        return self.update(
+            trending_score=Case(
+                When(trending_score__isnull=True, then=value),
+                default=(
+                    Greatest(F('trending_score'), value)
+                    + Ln(
+                        Value(1.0)
+                        + Exp(-Abs(F('trending_score') - value))
+                    )
+                ),
+                output_field=FloatField(),
             )
         )
 
+    def remove_trending_event(
+            self, weight: float, moment: datetime
+    ) -> int:
+        """
+        Вычитает из оценки популярности рецептов вклад события
+        одним запросом UPDATE: S = S + ln(1 - exp(v - S)).
+        Если вклад события не меньше оценки, она сбрасывается.
+        """
+        return self.update(
+            trending_score=trending_removal(get_event_value(weight, moment))
+        )
+
+    def remove_events(
+            self, counter_field: str, weight: float,
+            events: Iterable[tuple[int, datetime]]
+    ) -> int:
+        """
+        Уменьшает счетчик 'counter_field' рецептов и вычитает из их
+        оценки популярности вклад событий (ID рецепта, время события)
+        одним запросом UPDATE для всех рецептов. Счетчик
+        не уменьшается ниже нуля.
+        """
+        counts: Counter = Counter()
+        values: dict[int, float] = {}
+        for recipe_id, moment in events:
+            counts[recipe_id] += 1
+            values[recipe_id] = add_event_value(
+                values.get(recipe_id), get_event_value(weight, moment)
+            )
+        if not counts:
+            return 0
+        return self.filter(pk__in=counts).update(
+            **{
+                counter_field: Greatest(
+                    F(counter_field) - Case(
+                        *(
+                            When(pk=recipe_id, then=Value(count))
+                            for recipe_id, count in counts.items()
+                        ),
+                        default=Value(0),
+                    ),
+                    Value(0),
+                ),
+            },
+            trending_score=Case(
+                *(
+                    When(pk=recipe_id, then=trending_removal(value))
+                    for recipe_id, value in values.items()
+                ),
+                default=F('trending_score'),
+                output_field=FloatField(),
+            ),
+        )
+
+    def trending(self) -> 'RecipeQuerySet':
+        """Возвращает рецепты в порядке убывания популярности."""
+        return (
+            self
+            .filter(trending_score__isnull=False)
+            .order_by('-trending_score', '-id')
+        )
+
 
 class RecipeManager(Manager):
     """Manager для работы с моделью Recipe."""
@@ -32,35 +261,20 @@ class RecipeManager(Manager):
 
     def annotate_user_flags(self, user: User) -> 'RecipeQuerySet':
         """
-        Аннотирует флаги пользователя для рецептов,
-        проверяя, есть ли рецепт в его списке избранного
-        или корзине покупок.
+        Аннотирует флаги пользователя для рецептов
+        и загружает авторов с признаком подписки на них.
         """
         return (
             self
-            .annotate(
-                is_in_shopping_cart=Exists(
-                    queryset=User.objects.filter(
-                        id=user.id,
-                        shopping_cart=OuterRef('pk')
-                    )
-                )
-            )
-            .annotate(
-                is_favorited=Exists(
-                    queryset=User.objects.filter(
-                        id=user.id,
-                        favorites=OuterRef('pk')
-                    )
-                )
-            )
+            .get_queryset()
+            .annotate_user_flags(user)
             .prefetch_related(
                 Prefetch(
                     'author',
                     queryset=User.objects.annotate(
                         is_subscribed=Exists(
                             queryset=(
-                                Follow.with_related
+                                Follow.objects
                                 .filter(
                                     user=user,
                                     following=OuterRef('pk')
@@ -71,3 +285,42 @@ class RecipeManager(Manager):
                 )
             )
         )
+
+
+class ImageBlobQuerySet(QuerySet):
+    """QuerySet для работы с моделью ImageBlob."""
+    def retain(self, names: Iterable[str]) -> None:
+        """
+        Увеличивает счетчики ссылок на файлы, создавая недостающие
+        строки. Имя, переданное несколько раз, учитывается
+        соответствующее количество раз; файлы не из хранилища,
+        адресуемого по содержимому, пропускаются.
+        """
+        counts: Counter = Counter(filter(is_blob_name, names))
+        if not counts:
+            return
+        self.bulk_create(
+            [self.model(name=name) for name in sorted(counts)],
+            ignore_conflicts=True,
+        )
+        self.change_ref_counts(counts, 1)
+
+    def release(self, names: Iterable[str]) -> None:
+        """
+        Уменьшает счетчики ссылок на файлы. Файлы без ссылок
+        удаляет команда delete_orphan_images.
+        """
+        counts: Counter = Counter(filter(is_blob_name, names))
+        if counts:
+            self.change_ref_counts(counts, -1)
+
+    def change_ref_counts(self, counts: Counter, sign: int) -> None:
+        """
+        Изменяет счетчики ссылок одним запросом
+        на каждое различное значение изменения.
+        """
+        by_count = sorted(counts.items(), key=lambda item: item[1])
+        for count, items in groupby(by_count, key=lambda item: item[1]):
+            self.filter(name__in=[name for name, _ in items]).update(
+                ref_count=Greatest(F('ref_count') + sign * count, 0)
+            )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:38
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_alter_recipe_unique_together'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата публикации'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
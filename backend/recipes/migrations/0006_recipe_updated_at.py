@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
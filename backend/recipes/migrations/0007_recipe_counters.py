@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в корзины'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Оценка популярности'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('trending_score__isnull', False)), fields=['-trending_score', '-id'], name='recipe_trending_score_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+TAG_MASK_BITS = 63
+
+
+def fill_tag_bits(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    tags = list(Tag.objects.order_by('pk'))
+    if len(tags) > TAG_MASK_BITS:
+        raise ValueError(f'Нельзя хранить больше {TAG_MASK_BITS} тегов.')
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ['bit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name='Бит в маске тегов рецепта'),
+        ),
+        migrations.RunPython(fill_tag_bits, migrations.RunPython.noop),
+    ]
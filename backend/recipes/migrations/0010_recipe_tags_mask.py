@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def fill_tags_masks(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    masks = {}
+    for recipe_id, bit in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag__bit'
+    ):
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_tag_bit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, verbose_name='Бит в маске тегов рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
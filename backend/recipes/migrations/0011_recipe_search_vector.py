@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    SearchVector = django.contrib.postgres.search.SearchVector
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        search_vector=(
+            SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=settings.SEARCH_CONFIG)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_tags_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Вектор поиска'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient_name_measurement_unit_unique'),
+        ),
+    ]
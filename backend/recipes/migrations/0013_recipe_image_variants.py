@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_name_measurement_unit_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты обложки'),
+        ),
+    ]
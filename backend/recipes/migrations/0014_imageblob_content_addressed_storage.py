@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:23
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл изображения',
+                'verbose_name_plural': 'Файлы изображений',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/', verbose_name='Обложка рецепта'),
+        ),
+    ]
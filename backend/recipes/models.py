@@ -1,12 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
 
-from .managers import RecipeManager, RecipeQuerySet
+from .managers import ImageBlobQuerySet, RecipeManager, RecipeQuerySet
+from .storage import ContentAddressedStorage
 from core.models import NameString
 
 more_zero = MinValueValidator(1)
 
+TAG_MASK_BITS = 63
+
 User = get_user_model()
 
 
@@ -27,12 +33,32 @@ class Tag(NameString, models.Model):
         max_length=100,
         verbose_name='Идентификатор',
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name='Бит в маске тегов рецепта',
+    )
 
     class Meta:
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
         ordering = ('name',)
 
+    @classmethod
+    def get_free_bit(cls) -> int | None:
+        """Возвращает наименьший свободный бит маски тегов."""
+        used: set[int] = set(cls.objects.values_list('bit', flat=True))
+        return next(
+            (bit for bit in range(TAG_MASK_BITS) if bit not in used), None
+        )
+
+    def clean(self) -> None:
+        """Проверяет, что для нового тега есть свободный бит маски."""
+        if self.bit is None and self.get_free_bit() is None:
+            raise ValidationError(
+                f'Нельзя создать больше {TAG_MASK_BITS} тегов.'
+            )
+
 
 class Ingredient(NameString, models.Model):
     """Модель для хранения информации об ингредиентах."""
@@ -45,6 +71,12 @@ class Ingredient(NameString, models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='ingredient_name_measurement_unit_unique',
+            ),
+        ]
 
 
 class Recipe(NameString, models.Model):
@@ -57,6 +89,7 @@ class Recipe(NameString, models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/',
+        storage=ContentAddressedStorage(),
         verbose_name='Обложка рецепта',
     )
     text = models.TextField(
@@ -78,6 +111,46 @@ class Recipe(NameString, models.Model):
         verbose_name='Время приготовления',
         validators=[more_zero]
     )
+    pub_date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата публикации',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в корзины',
+    )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тегов',
+    )
+    trending_score = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Оценка популярности',
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты обложки',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Вектор поиска',
+    )
 
     objects = RecipeQuerySet.as_manager()
     with_related = RecipeManager()
@@ -85,6 +158,58 @@ class Recipe(NameString, models.Model):
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_score_idx',
+                condition=models.Q(trending_score__isnull=False),
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx',
+            ),
+        ]
+
+    @staticmethod
+    def get_variant_names(variants: dict[str, str]) -> list[str]:
+        """Возвращает имена файлов вариантов обложки."""
+        return [path for name, path in variants.items() if name != 'source']
+
+    def get_image_names(self) -> list[str]:
+        """Возвращает имена файлов обложки и ее вариантов."""
+        names: list[str] = [self.image.name] if self.image else []
+        return names + self.get_variant_names(self.image_variants)
+
+
+class ImageBlob(models.Model):
+    """
+    Модель для хранения количества ссылок рецептов на файл
+    в хранилище изображений, адресуемом по содержимому.
+    """
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Имя файла',
+    )
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество ссылок',
+    )
+
+    objects = ImageBlobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Файл изображения'
+        verbose_name_plural = 'Файлы изображений'
+
+    def __str__(self) -> str:
+        """Возвращает имя файла."""
+        return self.name
 
 
 class RecipeIngredient(models.Model):
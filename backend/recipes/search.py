@@ -0,0 +1,213 @@
+"""
+Полнотекстовый поиск рецептов по названию и описанию.
+
+Поиск выполняется через бэкенд, заданный настройкой SEARCH_BACKEND.
+Бэкенд обновляет свой индекс при сохранении и удалении рецептов
+и фильтрует запрос рецептов по строке поиска, добавляя к нему
+аннотацию 'search_rank' и сортировку по убыванию релевантности.
+Столбец описания при поиске не читается.
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from functools import cache
+from threading import Lock
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db.models import Case, F, FloatField, QuerySet, Value, When
+from django.utils.module_loading import import_string
+
+from .cache import get_recipes_generation
+from .models import Recipe
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class SearchBackend:
+    """Интерфейс бэкенда полнотекстового поиска рецептов."""
+
+    def update(self, recipes: Iterable[Recipe]) -> None:
+        """Обновляет индекс для сохраненных рецептов."""
+        raise NotImplementedError
+
+    def remove(self, recipe_ids: Iterable[int]) -> None:
+        """Удаляет рецепты из индекса."""
+        raise NotImplementedError
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet[Recipe]:
+        """
+        Возвращает рецепты, соответствующие строке поиска,
+        отсортированные по убыванию релевантности.
+        """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Поиск по столбцу Recipe.search_vector (tsvector) с GIN-индексом.
+    Название рецепта имеет вес 'A', описание - вес 'B';
+    слова приводятся к основе по правилам конфигурации SEARCH_CONFIG.
+    """
+
+    def get_vector(self) -> SearchVector:
+        """Возвращает выражение вектора поиска рецепта."""
+        return (
+            SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=settings.SEARCH_CONFIG)
+        )
+
+    def update(self, recipes: Iterable[Recipe]) -> None:
+        """Пересчитывает вектор поиска рецептов одним запросом."""
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ).update(search_vector=self.get_vector())
+
+    def remove(self, recipe_ids: Iterable[int]) -> None:
+        """Вектор поиска удаляется вместе со строкой рецепта."""
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet[Recipe]:
+        """Фильтрует рецепты по вектору поиска и ранжирует их."""
+        search_query: SearchQuery = SearchQuery(
+            query, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+
+class InMemorySearchBackend(SearchBackend):
+    """
+    Обратный индекс в памяти процесса для тестов и небольших
+    установок. Индекс загружается при первом поиске; изменения,
+    сделанные другими процессами, подгружаются по дате изменения
+    рецептов после смены поколения данных о рецептах.
+    Слово запроса совпадает со словами индекса, начинающимися с него,
+    что заменяет приведение к основе; все слова запроса обязательны.
+    """
+    name_weight = 1.0
+    text_weight = 0.4
+
+    def __init__(self) -> None:
+        self.lock: Lock = Lock()
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self.documents: dict[int, set[str]] = {}
+        self.vocabulary: list[str] | None = None
+        self.generation: int | None = None
+        self.synced_at: datetime | None = None
+
+    @staticmethod
+    def tokenize(value: str) -> list[str]:
+        """Разбивает строку на слова в нижнем регистре."""
+        return WORD_PATTERN.findall(value.casefold().replace('ё', 'е'))
+
+    def index_rows(
+            self, rows: Iterable[tuple[int, str, str, datetime]]
+    ) -> None:
+        """Добавляет строки рецептов в индекс, заменяя прежние записи."""
+        for recipe_id, name, text, updated_at in rows:
+            self.unindex(recipe_id)
+            weights: dict[str, float] = defaultdict(float)
+            for word in self.tokenize(name):
+                weights[word] += self.name_weight
+            for word in self.tokenize(text):
+                weights[word] += self.text_weight
+            for word, weight in weights.items():
+                self.postings[word][recipe_id] = weight
+            self.documents[recipe_id] = set(weights)
+            if self.synced_at is None or updated_at > self.synced_at:
+                self.synced_at = updated_at
+        self.vocabulary = None
+
+    def unindex(self, recipe_id: int) -> None:
+        """Удаляет записи рецепта из индекса."""
+        for word in self.documents.pop(recipe_id, ()):
+            postings: dict[int, float] = self.postings[word]
+            postings.pop(recipe_id, None)
+            if not postings:
+                del self.postings[word]
+        self.vocabulary = None
+
+    def sync(self) -> None:
+        """
+        Загружает индекс при первом обращении и подгружает рецепты,
+        измененные после последней синхронизации.
+        """
+        generation: int = get_recipes_generation()
+        if generation == self.generation:
+            return
+        rows: QuerySet = Recipe.objects.order_by().values_list(
+            'id', 'name', 'text', 'updated_at'
+        )
+        if self.synced_at is not None:
+            rows = rows.filter(updated_at__gte=self.synced_at)
+        self.index_rows(rows)
+        self.generation = generation
+
+    def update(self, recipes: Iterable[Recipe]) -> None:
+        """Переиндексирует сохраненные рецепты."""
+        with self.lock:
+            if self.generation is not None:
+                self.index_rows(
+                    (recipe.pk, recipe.name, recipe.text, recipe.updated_at)
+                    for recipe in recipes
+                )
+
+    def remove(self, recipe_ids: Iterable[int]) -> None:
+        """Удаляет рецепты из индекса."""
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self.unindex(recipe_id)
+
+    def match(self, word: str) -> dict[int, float]:
+        """Возвращает веса рецептов для слов индекса с префиксом 'word'."""
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        weights: dict[int, float] = defaultdict(float)
+        position: int = bisect_left(self.vocabulary, word)
+        for candidate in self.vocabulary[position:]:
+            if not candidate.startswith(word):
+                break
+            for recipe_id, weight in self.postings[candidate].items():
+                weights[recipe_id] += weight
+        return weights
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet[Recipe]:
+        """Фильтрует рецепты по индексу и ранжирует их по сумме весов."""
+        words: list[str] = self.tokenize(query)
+        if not words:
+            return queryset.none()
+        with self.lock:
+            self.sync()
+            ranks: dict[int, float] | None = None
+            for word in words:
+                weights: dict[int, float] = self.match(word)
+                if ranks is None:
+                    ranks = weights
+                else:
+                    ranks = {
+                        recipe_id: rank + weights[recipe_id]
+                        for recipe_id, rank in ranks.items()
+                        if recipe_id in weights
+                    }
+                if not ranks:
+                    return queryset.none()
+        return queryset.filter(pk__in=ranks).annotate(
+            search_rank=Case(
+                *(
+                    When(pk=recipe_id, then=Value(rank))
+                    for recipe_id, rank in ranks.items()
+                ),
+                output_field=FloatField(),
+            )
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+
+@cache
+def get_search_backend() -> SearchBackend:
+    """Возвращает экземпляр бэкенда поиска из настройки SEARCH_BACKEND."""
+    return import_string(settings.SEARCH_BACKEND)()
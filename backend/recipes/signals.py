@@ -0,0 +1,280 @@
+from collections import Counter
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from django.db import transaction
+from django.db.models import Model, QuerySet
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from .cache import bump_catalog_generation, bump_recipes_generation
+from .images import has_actual_variants, schedule_image_variants
+from .models import (
+    TAG_MASK_BITS, ImageBlob, Ingredient, Recipe, RecipeIngredient, Tag
+)
+from .search import get_search_backend
+from users.models import User
+
+# Поля пользователя, входящие в ответы о рецептах его авторства.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+# Рецепты, дата изменения которых уже обновлена при удалении
+# ингредиентов, по запросу, начавшему удаление.
+_touched_recipes: WeakKeyDictionary = WeakKeyDictionary()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender: type[Model], **kwargs: Any) -> None:
+    """
+    Увеличивает поколение данных о рецептах
+    после фиксации транзакции с изменениями.
+    """
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver(setting_changed)
+def search_backend_changed(setting: str, **kwargs: Any) -> None:
+    """
+    Сбрасывает экземпляр бэкенда поиска при изменении
+    настройки SEARCH_BACKEND, например в тестах.
+    """
+    if setting == 'SEARCH_BACKEND':
+        get_search_backend.cache_clear()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_update(
+        sender: type[Recipe], instance: Recipe,
+        update_fields: frozenset | None, **kwargs: Any
+) -> None:
+    """Обновляет поисковый индекс при изменении названия или описания."""
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        get_search_backend().update([instance])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(
+        sender: type[Recipe], instance: Recipe,
+        update_fields: frozenset | None, **kwargs: Any
+) -> None:
+    """
+    Ставит в очередь формирование уменьшенных вариантов обложки
+    после ее загрузки или замены.
+    """
+    if (
+        (update_fields is None or 'image' in update_fields)
+        and instance.image
+        and not has_actual_variants(
+            instance.image.name, instance.image_variants
+        )
+    ):
+        schedule_image_variants([instance.pk])
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_images_loaded(
+        sender: type[Recipe], instance: Recipe,
+        update_fields: frozenset | None, **kwargs: Any
+) -> None:
+    """
+    Запоминает имена сохраненных файлов обложки и ее вариантов
+    перед записью рецепта, в которой они могут измениться.
+    """
+    if update_fields is not None and not (
+        {'image', 'image_variants'} & set(update_fields)
+    ):
+        return
+    stored: Recipe | None = None
+    if not instance._state.adding:
+        stored = (
+            Recipe.objects.only('image', 'image_variants')
+            .filter(pk=instance.pk).first()
+        )
+    instance._stored_image_names = (
+        stored.get_image_names() if stored is not None else []
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_images_changed(
+        sender: type[Recipe], instance: Recipe, **kwargs: Any
+) -> None:
+    """
+    Изменяет счетчики ссылок на файлы обложки и ее вариантов,
+    добавленные в рецепт и убранные из него.
+    """
+    stored_names: list[str] | None = instance.__dict__.pop(
+        '_stored_image_names', None
+    )
+    if stored_names is None:
+        return
+    stored: Counter = Counter(stored_names)
+    current: Counter = Counter(instance.get_image_names())
+    ImageBlob.objects.retain((current - stored).elements())
+    ImageBlob.objects.release((stored - current).elements())
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_images_released(
+        sender: type[Recipe], instance: Recipe, **kwargs: Any
+) -> None:
+    """Уменьшает счетчики ссылок на файлы обложки удаленного рецепта."""
+    ImageBlob.objects.release(instance.get_image_names())
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_remove(
+        sender: type[Recipe], instance: Recipe, **kwargs: Any
+) -> None:
+    """Удаляет рецепт из поискового индекса."""
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_changed(
+        sender: type[Model], instance: RecipeIngredient, **kwargs: Any
+) -> None:
+    """
+    Обновляет дату изменения рецепта при изменении его ингредиентов
+    и увеличивает поколение данных о рецептах.
+    """
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(
+        sender: type[Model], instance: RecipeIngredient,
+        origin: Model | QuerySet, **kwargs: Any
+) -> None:
+    """
+    Обновляет дату изменения рецепта при удалении его ингредиентов
+    и увеличивает поколение данных о рецептах. При удалении набора
+    строк одним вызовом QuerySet.delete() каждый рецепт обновляется
+    один раз. Каскадное удаление вместе с рецептом или ингредиентом
+    пропускается: его обрабатывают сигналы этих моделей.
+    """
+    if isinstance(origin, (Recipe, Ingredient)):
+        return
+    if isinstance(origin, QuerySet):
+        touched: set[int] = _touched_recipes.setdefault(origin, set())
+        if instance.recipe_id in touched:
+            return
+        touched.add(instance.recipe_id)
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def catalog_changed(
+        sender: type[Model], instance: Tag | Ingredient, **kwargs: Any
+) -> None:
+    """
+    Обновляет дату изменения рецептов, в которых используется
+    тег или ингредиент, и увеличивает поколения справочников
+    и данных о рецептах.
+    """
+    instance.recipes.touch()
+    transaction.on_commit(bump_catalog_generation)
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver(pre_save, sender=Tag)
+def assign_tag_bit(sender: type[Tag], instance: Tag, **kwargs: Any) -> None:
+    """
+    Назначает новому тегу свободный бит маски тегов,
+    в том числе при загрузке фикстур.
+    """
+    if instance.bit is None:
+        instance.bit = Tag.get_free_bit()
+        if instance.bit is None:
+            raise ValueError(
+                f'Нельзя создать больше {TAG_MASK_BITS} тегов.'
+            )
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender: type[Tag], instance: Tag, **kwargs: Any) -> None:
+    """Снимает бит удаляемого тега в масках рецептов."""
+    instance.recipes.unset_tag_bit(instance.bit)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_mask_changed(
+        sender: type[Model], instance: Recipe | Tag, action: str,
+        reverse: bool, pk_set: set[int] | None, **kwargs: Any
+) -> None:
+    """Пересчитывает маски тегов рецептов при изменении их тегов."""
+    if reverse and action == 'pre_clear':
+        instance.recipes.unset_tag_bit(instance.bit)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        recipe_ids: set[int] = {instance.pk} if not reverse else pk_set
+        if recipe_ids:
+            Recipe.objects.filter(pk__in=recipe_ids).update_tags_mask()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(
+        sender: type[Model], instance: Recipe | Tag, action: str,
+        reverse: bool, pk_set: set[int] | None, **kwargs: Any
+) -> None:
+    """
+    Обновляет дату изменения рецептов при изменении их тегов
+    и увеличивает поколение данных о рецептах.
+    """
+    if reverse and action == 'pre_clear':
+        instance.recipes.touch()
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        Recipe.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).touch()
+    transaction.on_commit(bump_recipes_generation)
+
+
+@receiver(pre_save, sender=User)
+def author_fields_loaded(
+        sender: type[User], instance: User,
+        update_fields: frozenset | None, **kwargs: Any
+) -> None:
+    """
+    Перед записью пользователя определяет, изменяются ли
+    его данные, входящие в ответы о рецептах. Вход, смена пароля
+    и запись других полей данные автора не изменяют.
+    """
+    instance._author_changed = False
+    if (
+        instance._state.adding
+        or update_fields is not None
+        and not set(AUTHOR_FIELDS) & set(update_fields)
+    ):
+        return
+    stored: tuple[str, ...] | None = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*AUTHOR_FIELDS).first()
+    )
+    instance._author_changed = stored is not None and stored != tuple(
+        getattr(instance, field) for field in AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(
+        sender: type[User], instance: User, **kwargs: Any
+) -> None:
+    """
+    Обновляет дату изменения рецептов пользователя при изменении
+    его данных, так как данные автора входят в ответы о рецептах.
+    """
+    if not instance.__dict__.pop('_author_changed', False):
+        return
+    instance.recipes.touch()
+    transaction.on_commit(bump_recipes_generation)
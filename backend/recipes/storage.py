@@ -0,0 +1,126 @@
+"""
+Хранилище изображений, адресуемых по содержимому.
+
+Файл сохраняется под именем, образованным хешем SHA-256 его
+содержимого: 'recipes/ab/abcdef...png'. Одинаковые файлы хранятся
+один раз, а файл по одному адресу никогда не меняется, поэтому
+веб-сервер может отдавать такие файлы с заголовком кэширования
+'immutable'. Повторное сохранение существующего файла обновляет
+время его изменения: файлы без ссылок удаляются командой
+delete_orphan_images, только если они давно не сохранялись.
+"""
+import os
+import re
+from hashlib import sha256
+from posixpath import dirname, join, splitext
+from typing import Any, Iterator
+from uuid import uuid4
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+BLOB_NAME_PATTERN = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(\.\w+)?$')
+
+
+def is_blob_name(name: str) -> bool:
+    """Проверяет, что имя файла образовано хешем его содержимого."""
+    return bool(name) and BLOB_NAME_PATTERN.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, в котором имя файла образовано хешем
+    его содержимого. От исходного имени сохраняются только каталог
+    и расширение.
+    """
+
+    def get_available_name(
+            self, name: str, max_length: int | None = None
+    ) -> str:
+        """
+        Возвращает имя без изменений: итоговое имя определяется
+        содержимым файла, поэтому подбирать свободное не нужно.
+        """
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def _save(self, name: str, content: Any) -> str:
+        """
+        Записывает файл во временный файл, одновременно вычисляя хеш,
+        и переносит его под итоговое имя. Если файл с таким содержимым
+        уже есть, временный файл удаляется, а у существующего
+        обновляется время изменения.
+        """
+        directory: str = dirname(name)
+        self.make_directory(directory)
+        temp_path: str = self.path(join(directory, f'.{uuid4().hex}.tmp'))
+        digest = sha256()
+        try:
+            with open(temp_path, 'xb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            hexdigest: str = digest.hexdigest()
+            name = join(
+                directory, hexdigest[:2],
+                hexdigest + splitext(name)[1].lower()
+            )
+            self.make_directory(dirname(name))
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                os.replace(temp_path, self.path(name))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def make_directory(self, directory: str) -> None:
+        """Создает каталог хранилища с заданными правами доступа."""
+        path: str = self.path(directory)
+        if self.directory_permissions_mode is None:
+            os.makedirs(path, exist_ok=True)
+            return
+        old_umask: int = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(
+                path, self.directory_permissions_mode, exist_ok=True
+            )
+        finally:
+            os.umask(old_umask)
+
+    def list_blobs(self, directory: str) -> Iterator[str]:
+        """Перечисляет имена файлов, адресуемых по содержимому, в каталоге."""
+        directory = directory.rstrip('/')
+        if not self.exists(directory):
+            return
+        for shard in self.listdir(directory)[0]:
+            for file_name in self.listdir(join(directory, shard))[1]:
+                name: str = join(directory, shard, file_name)
+                if is_blob_name(name):
+                    yield name
+
+    def delete_unused(self, name: str, modified_before: float) -> bool:
+        """
+        Удаляет файл, если он не сохранялся повторно после момента
+        'modified_before', и возвращает True, если файл удален.
+        Файл сначала переименовывается, и время изменения проверяется
+        еще раз: сохранение, совпавшее с удалением, либо обновит
+        время до переименования, и файл будет возвращен, либо
+        не найдет файл и запишет его заново.
+        """
+        path: str = self.path(name)
+        trash_path: str = f'{path}.{uuid4().hex}.trash'
+        try:
+            if os.stat(path).st_mtime >= modified_before:
+                return False
+            os.rename(path, trash_path)
+        except FileNotFoundError:
+            return False
+        if os.stat(trash_path).st_mtime >= modified_before:
+            os.replace(trash_path, path)
+            return False
+        os.remove(trash_path)
+        return True
@@ -0,0 +1,211 @@
+import re
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import FavoriteRecipe, ShoppingCart, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Тесты не зависят от бэкенда поиска базы данных.
+SEARCH_BACKEND = 'recipes.search.InMemorySearchBackend'
+
+# Чтение строк избранного и корзин, кроме проверки EXISTS для флагов.
+USER_ROWS_PATTERN = re.compile(
+    r'(?<!EXISTS\(SELECT 1 AS "a" )'
+    r'FROM "users_(favoriterecipe|shoppingcart)"'
+)
+
+
+def get_image() -> SimpleUploadedFile:
+    """Возвращает файл изображения для обложки рецепта."""
+    buffer: BytesIO = BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, SEARCH_BACKEND=SEARCH_BACKEND)
+class RecipeQueryCountTest(TestCase):
+    """
+    Проверяет, что количество запросов списка и страницы рецепта
+    не зависит от количества строк избранного и корзин, а сами
+    строки не читаются: флаги пользователя вычисляются через EXISTS.
+    """
+    list_url = '/api/recipes/?limit=10'
+    list_queries = 5
+    detail_queries = 6
+    related_queries = 4
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+        tags: list[Tag] = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+            )
+        ]
+        ingredients: list[Ingredient] = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль')
+        ]
+        cls.recipes: list[Recipe] = []
+        for number in range(3):
+            recipe: Recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10, image=get_image(),
+            )
+            recipe.tags.set(tags[:number + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=5
+                )
+                for ingredient in ingredients[:number + 1]
+            )
+            cls.recipes.append(recipe)
+        FavoriteRecipe.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[0])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.anonymous: APIClient = APIClient()
+        self.client: APIClient = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def add_favorites_and_carts(self, users: int) -> None:
+        """Добавляет рецепты в избранное и корзины новых пользователей."""
+        start: int = User.objects.count()
+        for number in range(start, start + users):
+            user: User = User.objects.create_user(
+                email=f'user{number}@example.com', username=f'user{number}',
+                first_name='Пользователь', last_name='Рецептов',
+                password='password',
+            )
+            for recipe in self.recipes:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def get(self, client: APIClient, url: str) -> tuple[Response, list[str]]:
+        """
+        Выполняет запрос без закэшированных ответов и фрагментов
+        и возвращает ответ и SQL выполненных запросов.
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response: Response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def assert_user_rows_not_read(self, queries: list[str]) -> None:
+        """Проверяет, что строки избранного и корзин не читаются."""
+        for sql in queries:
+            self.assertIsNone(USER_ROWS_PATTERN.search(sql), sql)
+
+    def assert_constant_queries(self, client: APIClient, url: str) -> None:
+        """
+        Проверяет, что количество запросов не меняется
+        при росте количества строк избранного и корзин.
+        """
+        _, before = self.get(client, url)
+        self.add_favorites_and_carts(users=5)
+        _, after = self.get(client, url)
+        self.assertEqual(len(before), len(after))
+        self.assert_user_rows_not_read(after)
+
+    def test_list_query_count(self) -> None:
+        """Список рецептов формируется фиксированным числом запросов."""
+        for client in (self.anonymous, self.client):
+            with self.subTest(authenticated=client is self.client):
+                cache.clear()
+                with self.assertNumQueries(self.list_queries):
+                    response: Response = client.get(self.list_url)
+                self.assertEqual(len(response.data['results']), 3)
+
+    def test_detail_query_count(self) -> None:
+        """Страница рецепта формируется фиксированным числом запросов."""
+        url: str = f'/api/recipes/{self.recipes[0].pk}/'
+        for client in (self.anonymous, self.client):
+            with self.subTest(authenticated=client is self.client):
+                cache.clear()
+                with self.assertNumQueries(self.detail_queries):
+                    client.get(url)
+
+    def test_detail_not_found(self) -> None:
+        """Страница рецепта с неверным ID возвращает 404."""
+        for client in (self.anonymous, self.client):
+            for pk in ('abc', '0'):
+                with self.subTest(
+                    authenticated=client is self.client, pk=pk
+                ):
+                    response: Response = client.get(f'/api/recipes/{pk}/')
+                    self.assertEqual(response.status_code, 404)
+
+    def test_user_flags(self) -> None:
+        """Флаги пользователя вычисляются для каждого рецепта."""
+        response, queries = self.get(self.client, self.list_url)
+        flags: dict[int, tuple[bool, bool]] = {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart']
+            )
+            for recipe in response.data['results']
+        }
+        self.assertEqual(flags[self.recipes[0].pk], (True, True))
+        self.assertEqual(flags[self.recipes[1].pk], (False, False))
+        self.assert_user_rows_not_read(queries)
+
+    def test_list_queries_do_not_grow(self) -> None:
+        """Запросы списка не зависят от строк избранного и корзин."""
+        for client in (self.anonymous, self.client):
+            with self.subTest(authenticated=client is self.client):
+                self.assert_constant_queries(client, self.list_url)
+
+    def test_detail_queries_do_not_grow(self) -> None:
+        """Запросы страницы рецепта не зависят от строк избранного и корзин."""
+        url: str = f'/api/recipes/{self.recipes[0].pk}/'
+        self.assert_constant_queries(self.client, url)
+
+    @override_settings(FAST_RECIPE_SERIALIZER=False)
+    def test_read_serializer_queries_do_not_grow(self) -> None:
+        """
+        Запросы списка через RecipeReadSerializer
+        не зависят от строк избранного и корзин.
+        """
+        self.assert_constant_queries(self.client, self.list_url)
+
+    def test_related_tables_query_count(self) -> None:
+        """
+        План предварительной загрузки с флагами пользователя
+        имеет фиксированный размер: рецепты, теги, ингредиенты, автор.
+        """
+        self.add_favorites_and_carts(users=5)
+        with CaptureQueriesContext(connection) as context:
+            with self.assertNumQueries(self.related_queries):
+                recipes: list[Recipe] = list(
+                    Recipe.with_related.annotate_user_flags(self.reader)
+                )
+        self.assert_user_rows_not_read(
+            [query['sql'] for query in context.captured_queries]
+        )
+        self.assertEqual(len(recipes), 3)
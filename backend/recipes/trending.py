@@ -0,0 +1,32 @@
+"""
+Расчет оценки популярности рецептов с экспоненциальным затуханием.
+
+Оценка хранится в логарифмической шкале прямого затухания:
+S = ln(sum(w * exp(t / tau))), где t - время события в секундах,
+w - вес события, tau - постоянная затухания. Порядок рецептов по S
+совпадает с порядком по затухающей сумме весов в любой момент времени,
+поэтому события добавляются и удаляются без пересчета остальных строк,
+а значения не переполняются с течением времени.
+"""
+from datetime import datetime
+from math import exp, log, log1p
+
+from django.conf import settings
+
+
+def get_decay_constant() -> float:
+    """Возвращает постоянную затухания в секундах."""
+    return settings.TRENDING_HALF_LIFE / log(2)
+
+
+def get_event_value(weight: float, moment: datetime) -> float:
+    """Возвращает вклад события в оценку в логарифмической шкале."""
+    return log(weight) + moment.timestamp() / get_decay_constant()
+
+
+def add_event_value(score: float | None, value: float) -> float:
+    """Добавляет вклад события к оценке (log-sum-exp)."""
+    if score is None:
+        return value
+    high, low = max(score, value), min(score, value)
+    return high + log1p(exp(low - high))
@@ -5,3 +5,7 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов приложения."""
+        from . import signals  # noqa: F401
@@ -1,6 +1,19 @@
+from datetime import timedelta
+from hashlib import md5
+from typing import Iterable
+
 from django.apps import apps
+from django.conf import settings
 from django.contrib.auth.models import UserManager as DjangoUserManager
-from django.db.models import QuerySet, Manager, Sum, Exists, OuterRef
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    QuerySet, Manager, Exists, OuterRef, F, Model, Q
+)
+from django.utils import timezone
+
+# Количество попыток изменить списки покупок, если строку списка
+# одновременно создала другая транзакция.
+APPLY_DELTAS_ATTEMPTS = 3
 
 
 class UserManager(DjangoUserManager):
@@ -52,29 +65,161 @@ class FollowManager(Manager):
         )
 
 
-class ShoppingCartQuerySet(QuerySet):
-    """QuerySet для работы с моделью ShoppingCart."""
-    def get_ingredients_shoppingcart(self) -> 'ShoppingCartQuerySet':
+class ShoppingListItemQuerySet(QuerySet):
+    """QuerySet для работы с моделью ShoppingListItem."""
+    def apply_deltas(
+            self, user_ids: Iterable[int], deltas: dict[int, int]
+    ) -> None:
         """
-        Получает ингредиенты, их количство и единицу измерения
-        для корзины покупок.
+        Изменяет количество ингредиентов в списках покупок пользователей
+        на 'deltas' (ID ингредиента -> изменение количества).
+        Изменение выполняется в точке сохранения; если отсутствующую
+        строку одновременно создала другая транзакция, вставка нарушает
+        ограничение уникальности, и изменение повторяется: при повторе
+        строка уже существует и блокируется вместе с остальными.
         """
-        return (
-            self
-            .values(
-                'recipe__recipeingredient__ingredient__name',
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        for attempt in range(1, APPLY_DELTAS_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    self.write_deltas(user_ids, deltas)
+                return
+            except IntegrityError:
+                if attempt == APPLY_DELTAS_ATTEMPTS:
+                    raise
+
+    def write_deltas(
+            self, user_ids: list[int], deltas: dict[int, int]
+    ) -> None:
+        """
+        Записывает изменения количества. Существующие строки
+        блокируются на время изменения; строки с нулевым
+        количеством удаляются.
+        """
+        items: dict[tuple[int, int], Model] = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas
             )
-            .annotate(
-                total_amount=Sum(
-                    'recipe__recipeingredient__amount',
+        }
+        created: list[Model] = []
+        changed: list[Model] = []
+        emptied: list[int] = []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        created.append(
+                            self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                total_amount=delta,
+                            )
+                        )
+                    continue
+                item.total_amount += delta
+                if item.total_amount > 0:
+                    changed.append(item)
+                else:
+                    emptied.append(item.pk)
+        self.bulk_create(created)
+        self.bulk_update(changed, ['total_amount'])
+        self.filter(pk__in=emptied).delete()
+
+    def add_recipe(
+            self, recipe_id: int, user_ids: Iterable[int], sign: int = 1
+    ) -> None:
+        """
+        Добавляет ингредиенты рецепта в списки покупок пользователей
+        (или вычитает их при sign=-1).
+        """
+        amounts = apps.get_model(
+            app_label='recipes', model_name='RecipeIngredient'
+        ).objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', 'amount'
+        )
+        self.apply_deltas(
+            user_ids,
+            {ingredient_id: sign * amount for ingredient_id, amount in amounts}
+        )
+
+    def change_recipe(
+            self, recipe_id: int, old: dict[int, int], new: dict[int, int]
+    ) -> None:
+        """
+        Применяет изменение ингредиентов рецепта (ID ингредиента ->
+        количество до и после) к спискам покупок пользователей,
+        у которых рецепт в корзине.
+        """
+        user_ids = apps.get_model(
+            app_label='users', model_name='ShoppingCart'
+        ).objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        )
+        self.apply_deltas(
+            user_ids,
+            {
+                ingredient_id: (
+                    new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
                 )
-            )
-            .order_by(
-                'recipe__recipeingredient__ingredient__name',
-            )
+                for ingredient_id in old.keys() | new.keys()
+            }
+        )
+
+    def for_export(self) -> 'ShoppingListItemQuerySet':
+        """
+        Возвращает названия, единицы измерения и количество
+        ингредиентов, отсортированные по названию.
+        """
+        return (
+            self
+            .order_by('ingredient__name')
             .values(
-                'recipe__recipeingredient__ingredient__measurement_unit',
-                'recipe__recipeingredient__ingredient__name',
                 'total_amount',
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+            )
+        )
+
+    def get_version(self) -> str:
+        """
+        Возвращает версию списка покупок: хэш строк списка
+        (ID ингредиента и количество) и поколения справочников,
+        в котором хранятся названия и единицы измерения ингредиентов.
+        """
+        from recipes.cache import get_catalog_generation
+
+        rows: list[tuple[int, int]] = list(
+            self
+            .order_by('ingredient_id')
+            .values_list('ingredient_id', 'total_amount')
+        )
+        return md5(f'{get_catalog_generation()}:{rows}'.encode()).hexdigest()
+
+
+class ShoppingListExportQuerySet(QuerySet):
+    """QuerySet для работы с моделью ShoppingListExport."""
+    def usable(self) -> 'ShoppingListExportQuerySet':
+        """
+        Возвращает готовые задачи и задачи в работе, созданные
+        не раньше SHOPPING_LIST_EXPORT_TIMEOUT секунд назад.
+        Более старые незавершенные задачи считаются потерянными
+        (например, при перезапуске процесса).
+        """
+        Status = self.model.Status
+        return self.filter(
+            Q(status=Status.DONE)
+            | Q(
+                status__in=(Status.PENDING, Status.RUNNING),
+                created_at__gte=timezone.now() - timedelta(
+                    seconds=settings.SHOPPING_LIST_EXPORT_TIMEOUT
+                ),
             )
         )
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_rename_favouriterecipe_favoriterecipe_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ['-date_added', '-id'], 'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', '-date_added', '-id'], name='follow_user_date_added_idx'),
+        ),
+    ]
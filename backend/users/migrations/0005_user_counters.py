@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_follow_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+    ]
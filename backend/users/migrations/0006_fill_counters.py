@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    FavoriteRecipe = apps.get_model('users', 'FavoriteRecipe')
+    ShoppingCart = apps.get_model('users', 'ShoppingCart')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.update(
+        favorites_count=count_subquery(FavoriteRecipe, 'recipe'),
+        in_carts_count=count_subquery(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Follow, 'following'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+        ('users', '0005_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
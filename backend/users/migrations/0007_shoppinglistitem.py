@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_name_measurement_unit_unique'),
+        ('users', '0006_fill_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Списки покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='shopping_list_user_ingredient_unique'),
+        ),
+    ]
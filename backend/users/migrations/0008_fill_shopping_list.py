@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def fill_shopping_list(apps, schema_editor):
+    ShoppingCart = apps.get_model('users', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('users', 'ShoppingListItem')
+    totals = (
+        ShoppingCart.objects
+        .filter(recipe__recipeingredient__isnull=False)
+        .order_by()
+        .values_list('user_id', 'recipe__recipeingredient__ingredient_id')
+        .annotate(total=Sum('recipe__recipeingredient__amount'))
+    )
+    batch = []
+    for user_id, ingredient_id, total in totals.iterator(chunk_size=1000):
+        batch.append(
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total,
+            )
+        )
+        if len(batch) == 1000:
+            ShoppingListItem.objects.bulk_create(batch)
+            batch = []
+    ShoppingListItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_shopping_list, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_fill_shopping_list'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32, verbose_name='Версия списка покупок')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Формируется'), ('done', 'Готов'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('file', models.FileField(blank=True, upload_to='shopping_lists/', verbose_name='Файл')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_exports', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Выгрузка списка покупок',
+                'verbose_name_plural': 'Выгрузки списков покупок',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
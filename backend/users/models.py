@@ -2,8 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from .managers import (
-    UserManager, FollowManager,
-    FollowQuerySet, ShoppingCartQuerySet
+    UserManager, FollowManager, FollowQuerySet,
+    ShoppingListExportQuerySet, ShoppingListItemQuerySet
 )
 from core.models import UserRecipe, DateAdded
 
@@ -50,6 +50,16 @@ class User(AbstractUser):
         related_name='user_shopping_cart',
         verbose_name='Корзина',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
 
     objects = UserManager()
 
@@ -78,9 +88,16 @@ class Follow(DateAdded, models.Model):
     with_related = FollowManager()
 
     class Meta:
+        ordering = ['-date_added', '-id']
         unique_together = ['user', 'following']
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=('user', '-date_added', '-id'),
+                name='follow_user_date_added_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         """
@@ -97,6 +114,9 @@ class FavoriteRecipe(UserRecipe, DateAdded, models.Model):
     Промежуточная модель для хранения связи
     пользователя и его избранных рецептов.
     """
+    recipe_counter_field = 'favorites_count'
+    trending_weight = 1.0
+
     class Meta:
         ordering = ['-date_added', 'user']
         unique_together = ['user', 'recipe']
@@ -115,7 +135,8 @@ class ShoppingCart(UserRecipe, DateAdded, models.Model):
     Промежуточная модель для хранения связи
     пользователя и рецептов в его корзине.
     """
-    objects = ShoppingCartQuerySet.as_manager()
+    recipe_counter_field = 'in_carts_count'
+    trending_weight = 0.5
 
     class Meta:
         ordering = ['-date_added', 'user']
@@ -128,3 +149,101 @@ class ShoppingCart(UserRecipe, DateAdded, models.Model):
         Возвращает строковое представление при обращении к объекту.
         """
         return f'Корзина {self.user.first_name} {self.user.last_name}'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель для хранения суммарного количества ингредиента
+    в корзине пользователя. Обновляется приращениями при изменении
+    корзины и ингредиентов рецептов в ней.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        'recipes.Ingredient',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_list_user_ingredient_unique',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление при обращении к объекту.
+        """
+        return f'{self.ingredient} для {self.user}'
+
+
+class ShoppingListExport(models.Model):
+    """
+    Модель задачи фонового формирования файла списка покупок.
+    Файл сохраняется в MEDIA_ROOT под случайным именем
+    и отдается по ссылке, которую знает только владелец задачи.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Формируется'
+        DONE = 'done', 'Готов'
+        FAILED = 'failed', 'Ошибка'
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_exports',
+        verbose_name='Пользователь',
+    )
+    version = models.CharField(
+        max_length=32,
+        verbose_name='Версия списка покупок',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    file = models.FileField(
+        upload_to='shopping_lists/',
+        blank=True,
+        verbose_name='Файл',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения',
+    )
+
+    objects = ShoppingListExportQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+        ordering = ('-created_at',)
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление при обращении к объекту.
+        """
+        return f'Выгрузка {self.pk} для {self.user}'
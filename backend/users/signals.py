@@ -0,0 +1,176 @@
+from typing import Any
+
+from django.db.models import F, Model, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import (
+    FavoriteRecipe, Follow, ShoppingCart, ShoppingListItem, User
+)
+from recipes.models import Recipe
+
+
+def change_counter(
+        model: type[Model], pk: int, field: str, delta: int
+) -> None:
+    """
+    Атомарно изменяет счетчик объекта на 'delta' выражением F().
+    Счетчик не уменьшается ниже нуля.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def deleted_with(origin: Model | QuerySet | None, *models: type) -> bool:
+    """
+    Проверяет, что удаление начато с объекта или запроса
+    одной из моделей 'models' и строка удаляется каскадно.
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, models)
+    return isinstance(origin, models)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+def user_recipe_created(
+        sender: type[FavoriteRecipe | ShoppingCart],
+        instance: FavoriteRecipe | ShoppingCart, created: bool, **kwargs: Any
+) -> None:
+    """
+    Увеличивает счетчик добавлений рецепта в избранное или корзины
+    и добавляет событие в оценку популярности рецепта.
+    """
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, sender.recipe_counter_field, 1
+        )
+        Recipe.objects.filter(pk=instance.recipe_id).add_trending_event(
+            sender.trending_weight, instance.date_added
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+def user_recipe_deleted(
+        sender: type[FavoriteRecipe | ShoppingCart],
+        instance: FavoriteRecipe | ShoppingCart,
+        origin: Model | QuerySet | None = None, **kwargs: Any
+) -> None:
+    """
+    Уменьшает счетчик добавлений рецепта в избранное или корзины
+    и удаляет событие из оценки популярности рецепта. При удалении
+    рецепта его строки не обрабатываются, а при удалении
+    пользователя счетчики изменяет user_deleted одним запросом.
+    """
+    if deleted_with(origin, Recipe, User):
+        return
+    change_counter(
+        Recipe, instance.recipe_id, sender.recipe_counter_field, -1
+    )
+    Recipe.objects.filter(pk=instance.recipe_id).remove_trending_event(
+        sender.trending_weight, instance.date_added
+    )
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender: type[User], instance: User, **kwargs: Any) -> None:
+    """
+    Уменьшает счетчики и оценки популярности рецептов других авторов,
+    которые пользователь добавил в избранное или корзину, одним
+    запросом для каждой модели вместо обработки каскадно
+    удаляемых строк по одной.
+    """
+    for model in (FavoriteRecipe, ShoppingCart):
+        Recipe.objects.remove_events(
+            model.recipe_counter_field, model.trending_weight,
+            model.objects
+            .filter(user=instance)
+            .exclude(recipe__author=instance)
+            .values_list('recipe_id', 'date_added')
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(
+        sender: type[ShoppingCart], instance: ShoppingCart, created: bool,
+        **kwargs: Any
+) -> None:
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.recipe_id, [instance.user_id]
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleted(
+        sender: type[ShoppingCart], instance: ShoppingCart,
+        origin: Model | QuerySet | None = None, **kwargs: Any
+) -> None:
+    """
+    Вычитает ингредиенты рецепта из списка покупок пользователя.
+    Выполняется до удаления, так как при удалении рецепта
+    его ингредиенты удаляются вместе с корзинами. При удалении
+    пользователя его список покупок удаляется каскадно, а при
+    удалении рецепта ингредиенты вычитает recipe_cart_deleted
+    сразу для всех корзин.
+    """
+    if deleted_with(origin, Recipe, User):
+        return
+    ShoppingListItem.objects.add_recipe(
+        instance.recipe_id, [instance.user_id], sign=-1
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_cart_deleted(
+        sender: type[Recipe], instance: Recipe, **kwargs: Any
+) -> None:
+    """
+    Вычитает ингредиенты удаляемого рецепта из списков покупок
+    всех пользователей, у которых он в корзине, одним изменением.
+    """
+    ShoppingListItem.objects.add_recipe(
+        instance.pk,
+        ShoppingCart.objects.filter(recipe=instance).values_list(
+            'user_id', flat=True
+        ),
+        sign=-1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(
+        sender: type[Recipe], instance: Recipe, created: bool, **kwargs: Any
+) -> None:
+    """Увеличивает счетчик рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(
+        sender: type[Recipe], instance: Recipe, **kwargs: Any
+) -> None:
+    """Уменьшает счетчик рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(
+        sender: type[Follow], instance: Follow, created: bool, **kwargs: Any
+) -> None:
+    """Увеличивает счетчик подписчиков пользователя."""
+    if created:
+        change_counter(User, instance.following_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(
+        sender: type[Follow], instance: Follow, **kwargs: Any
+) -> None:
+    """Уменьшает счетчик подписчиков пользователя."""
+    change_counter(User, instance.following_id, 'followers_count', -1)
@@ -0,0 +1,196 @@
+from math import isclose
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import FavoriteRecipe, ShoppingCart, ShoppingListItem, User
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.trending import add_event_value, get_event_value
+
+# Тесты не зависят от бэкенда поиска базы данных.
+SEARCH_BACKEND = 'recipes.search.InMemorySearchBackend'
+
+
+def create_user(name: str) -> User:
+    """Создает пользователя с именем 'name'."""
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name,
+        first_name=name, last_name='Рецептов', password='password',
+    )
+
+
+@override_settings(SEARCH_BACKEND=SEARCH_BACKEND)
+class RecipeCountersTest(TestCase):
+    """
+    Проверяет счетчики и оценку популярности рецептов
+    при каскадном удалении избранного и корзин.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = create_user('author')
+        cls.other_author = create_user('other')
+        cls.users: list[User] = [create_user(f'user{i}') for i in range(3)]
+        cls.recipes: list[Recipe] = [
+            Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                cooking_time=1,
+            )
+            for author in (cls.author, cls.author, cls.other_author)
+        ]
+        for user in (*cls.users, cls.other_author):
+            for recipe in cls.recipes:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def assert_counters(self) -> None:
+        """Сверяет счетчики и оценку рецептов с оставшимися строками."""
+        for recipe in Recipe.objects.all():
+            score: float | None = None
+            for model in (FavoriteRecipe, ShoppingCart):
+                for moment in model.objects.filter(
+                    recipe=recipe
+                ).values_list('date_added', flat=True):
+                    score = add_event_value(
+                        score, get_event_value(model.trending_weight, moment)
+                    )
+            self.assertEqual(
+                recipe.favorites_count,
+                FavoriteRecipe.objects.filter(recipe=recipe).count()
+            )
+            self.assertEqual(
+                recipe.in_carts_count,
+                ShoppingCart.objects.filter(recipe=recipe).count()
+            )
+            self.assertTrue(isclose(recipe.trending_score, score))
+
+    def count_recipe_updates(self, obj: Recipe | User) -> int:
+        """Удаляет объект и возвращает количество UPDATE рецептов."""
+        with CaptureQueriesContext(connection) as context:
+            obj.delete()
+        return sum(
+            query['sql'].startswith('UPDATE "recipes_recipe"')
+            for query in context.captured_queries
+        )
+
+    def test_user_deleted(self) -> None:
+        """Удаление пользователя изменяет счетчики запросом на модель."""
+        self.assertEqual(self.count_recipe_updates(self.users[0]), 2)
+        self.assert_counters()
+
+    def test_author_deleted(self) -> None:
+        """
+        При удалении автора его рецепты удаляются, а счетчики
+        остальных рецептов уменьшаются на его строки.
+        """
+        self.count_recipe_updates(self.other_author)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assert_counters()
+
+    def test_recipe_deleted(self) -> None:
+        """Удаление рецепта не обновляет счетчики по его строкам."""
+        self.assertEqual(self.count_recipe_updates(self.recipes[0]), 0)
+        self.assert_counters()
+
+    def test_user_recipe_deleted(self) -> None:
+        """Удаление строки избранного уменьшает счетчик рецепта."""
+        FavoriteRecipe.objects.filter(
+            user=self.users[0], recipe=self.recipes[0]
+        ).delete()
+        self.assert_counters()
+
+
+@override_settings(SEARCH_BACKEND=SEARCH_BACKEND)
+class ShoppingListTest(TestCase):
+    """
+    Проверяет списки покупок при каскадном удалении корзин:
+    рецепт вычитается из всех списков одним изменением,
+    а список удаляемого пользователя не пересчитывается.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = create_user('author')
+        cls.users: list[User] = [create_user(f'user{i}') for i in range(3)]
+        ingredients: list[Ingredient] = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар')
+        ]
+        cls.recipes: list[Recipe] = []
+        for number in range(3):
+            recipe: Recipe = Recipe.objects.create(
+                author=cls.author, name='Рецепт', text='Описание',
+                cooking_time=1,
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients
+            )
+            cls.recipes.append(recipe)
+        # Первый рецепт в корзинах всех пользователей, второй -
+        # в одной корзине, третий не дает спискам опустеть.
+        for user in cls.users:
+            ShoppingCart.objects.create(user=user, recipe=cls.recipes[0])
+            ShoppingCart.objects.create(user=user, recipe=cls.recipes[2])
+        ShoppingCart.objects.create(user=cls.users[0], recipe=cls.recipes[1])
+
+    def assert_shopping_lists(self) -> None:
+        """Сверяет списки покупок с рецептами в корзинах."""
+        expected: dict[tuple[int, int], int] = {}
+        for user_id, recipe_id in ShoppingCart.objects.values_list(
+            'user_id', 'recipe_id'
+        ):
+            for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', 'amount'):
+                key: tuple[int, int] = (user_id, ingredient_id)
+                expected[key] = expected.get(key, 0) + amount
+        self.assertEqual(
+            dict(
+                ((user_id, ingredient_id), amount)
+                for user_id, ingredient_id, amount in (
+                    ShoppingListItem.objects.values_list(
+                        'user_id', 'ingredient_id', 'total_amount'
+                    )
+                )
+            ),
+            expected
+        )
+
+    def delete(self, obj: Recipe | User) -> list[str]:
+        """
+        Удаляет объект и возвращает запросы
+        к таблице списков покупок.
+        """
+        with CaptureQueriesContext(connection) as context:
+            obj.delete()
+        return [
+            query['sql'] for query in context.captured_queries
+            if '"users_shoppinglistitem"' in query['sql']
+        ]
+
+    def test_recipe_deleted(self) -> None:
+        """
+        Количество запросов к спискам покупок при удалении рецепта
+        не зависит от количества корзин с ним.
+        """
+        single: list[str] = self.delete(self.recipes[1])
+        self.assert_shopping_lists()
+        self.assertEqual(len(self.delete(self.recipes[0])), len(single))
+        self.assert_shopping_lists()
+
+    def test_user_deleted(self) -> None:
+        """Список покупок удаляемого пользователя только удаляется."""
+        for sql in self.delete(self.users[0]):
+            self.assertTrue(sql.startswith('DELETE'), sql)
+        self.assert_shopping_lists()
+
+    def test_cart_deleted(self) -> None:
+        """Удаление рецепта из корзины вычитает его из списка."""
+        ShoppingCart.objects.filter(
+            user=self.users[1], recipe=self.recipes[0]
+        ).delete()
+        self.assert_shopping_lists()